@@ -1,11 +1,24 @@
 import pygame
 import sys
+import functools
+import os
 import math
-import numpy as np
-import random
-import matplotlib.pyplot as plt
 
-# Initialize Pygame
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.stats import RegretStats
+from common.timing import span
+from common.decision_log import open_from_env
+from battle_regret import RegretTable
+from battle_rules import A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER, BattleRules
+from battle_bandits import BernoulliAPSBandit
+from battle_audio import AudioManager, pre_init_mixer
+from battle_assets import AssetManager
+from battle_render import SpriteCache, Animator, TextCache, Compositor, frame_ratio
+from battle_scenes import Scene, SceneScheduler, DONE
+
+# Initialize Pygame, with a small mixer buffer for low sound latency
+pre_init_mixer()
 pygame.init()
 
 # Set up the screen
@@ -14,33 +27,27 @@ screen_height = 600
 screen = pygame.display.set_mode((screen_width, screen_height))
 pygame.display.set_caption("Dragon Ball Z")
 
+# Load images in the display's pixel format, with the decoded and scaled pixels cached on disk
+# (see battle_assets.py)
+assets = AssetManager()
+
 # Load start screen background image
-start_background_img = pygame.image.load("start_bg.jpg")
-start_background_img = pygame.transform.scale(start_background_img, (screen_width, screen_height))
+start_background_img = assets.image("start_bg.jpg", (screen_width, screen_height))
 
 # Load background image
-background_img = pygame.image.load("bg.jpeg")
-background_img = pygame.transform.scale(background_img, (screen_width, screen_height))
-
-# Load character images and scale them down
-character1_img = pygame.image.load("naruto.png")
-character1_img = pygame.transform.scale(character1_img, (240, 280))
-
-character2_img = pygame.image.load("goku.png")
-character2_img = pygame.transform.scale(character2_img, (160, 240))
-
-# Load button images and scale them down
-attack_btn_img = pygame.image.load("laser.png")
-attack_btn_img = pygame.transform.scale(attack_btn_img, (50, 50))
-
-defend_btn_img = pygame.image.load("shield.png")
-defend_btn_img = pygame.transform.scale(defend_btn_img, (50, 50))
-
-gold_btn_img = pygame.image.load("gold.png")
-gold_btn_img = pygame.transform.scale(gold_btn_img, (50, 50))
-
-special_btn_img = pygame.image.load("special.png")
-special_btn_img = pygame.transform.scale(special_btn_img, (50, 50))
+background_img = assets.image("bg.jpeg", (screen_width, screen_height))
+
+# Load character, button and start button images scaled down, packed into one atlas
+(character1_img, character2_img, attack_btn_img, defend_btn_img, gold_btn_img, special_btn_img,
+ start_button_img) = assets.sprites([
+    ("naruto.png", (240, 280)),
+    ("goku.png", (160, 240)),
+    ("laser.png", (50, 50)),
+    ("shield.png", (50, 50)),
+    ("gold.png", (50, 50)),
+    ("special.png", (50, 50)),
+    ("start_btn.png", (300, 200)),
+])
 
 # Set initial positions for characters
 char1_x = 100
@@ -49,9 +56,23 @@ char1_y = screen_height // 2 - character1_img.get_height() // 2
 char2_x = screen_width - 100 - character2_img.get_width()
 char2_y = screen_height // 2 - character2_img.get_height() // 2
 
-# Load sound effects
-bg_music = pygame.mixer.Sound("background_music.mp3")
-start_music = pygame.mixer.Sound("start_music.mp3")
+# Scaled/rotated animation frames, transformed once and then only blitted (see battle_render.py)
+sprite_cache = SpriteCache()
+attack_frame_sizes = [(int(50 + 150 * i / 30),) * 2 for i in range(30)]
+special_frame_sizes = [(5 * (i + 1),) * 2 for i in range(50)]
+sprite_cache.warm(attack_btn_img, attack_frame_sizes)
+sprite_cache.warm(attack_btn_img, attack_frame_sizes, 180)
+sprite_cache.warm(character1_img, special_frame_sizes)
+sprite_cache.warm(character2_img, special_frame_sizes)
+
+# Running animations, advanced by the scenes' fixed simulation steps (see battle_scenes.py)
+animator = Animator()
+scheduler = SceneScheduler()
+
+# Music is streamed from disk while it plays (see battle_audio.py)
+audio = AudioManager()
+bg_music = "background_music.mp3"
+start_music = "start_music.mp3"
 
 # Player attributes
 player1_health = 500
@@ -70,57 +91,24 @@ black = (0, 0, 0)
 # Font
 font = pygame.font.Font(None, 24)
 
-# Define actions
-A_ATTACK = 0
-A_DEFEND = 1
-A_BUILD_GOLD = 2
-A_SPECIAL_POWER = 3
-
-#APS
-class BernoulliAPSBandit:
-    def __init__(self, n_arms, eta=0.05):        
-        self.n_arms = n_arms
-        self.eta = eta
-        self.exploration_weights = np.ones(n_arms)  # Initialize exploration weights uniformly
-        
-    def pull_arm(self):        
-        normalized_weights = self.exploration_weights / np.sum(self.exploration_weights)
-        cum_prob = np.cumsum(normalized_weights)
-        rand_num = np.random.rand()
-        location_index = next(i for i in range(len(cum_prob)) if cum_prob[i] > rand_num)
-        return location_index
-    
-    def update(self, chosen_location, reward):  
-        k = self.n_arms
-        w_t = self.exploration_weights[chosen_location]  # Weight before update
-        
-        # Ensure w_t is never exactly 1 to avoid division by zero
-        w_t = np.clip(w_t, None, 0.9999)
-
-        if reward == 1:
-            self.exploration_weights[chosen_location] = (1 - np.exp(-self.eta)) / (1 - np.exp(-self.eta / w_t))
-        else:
-            self.exploration_weights[chosen_location] = (np.exp(self.eta) - 1) / (np.exp(self.eta / w_t) - 1)
-        
-        # Adjust other weights
-        for i in range(k):
-            if i != chosen_location:
-                # Protect against division by zero or undefined operations
-                try:
-                    adjustment = ((1 - self.exploration_weights[chosen_location]) / max(1 - w_t, 0.0001))
-                    self.exploration_weights[i] = np.clip(self.exploration_weights[i] * adjustment, 0.001, None)
-                except RuntimeWarning as e:
-                    print(f"Warning: {e}")
+# Game rules, compiled into lookup tables (see battle_rules.py)
+rules = BattleRules("battle_APS_human")
+regret_table = RegretTable("battle_APS_human")  # Player 2 regret per turn, see battle_regret.py
 
 # Create bandit for player 2
-player2_bandit = BernoulliAPSBandit(4)
+player2_bandit = BernoulliAPSBandit(4, eta=0.05)
 
-# Lists to store regrets
-regret_player2 = []
+# Streaming regret statistics per turn
+regret_player2 = RegretStats()
 cumulative_regret = 0
+turn = 0
+# Decision records of every step, only written when GAME_LOG is set (see common/decision_log.py)
+decision_log = open_from_env("battle_APS_human")
 player1_action = None
+selected_action = None  # Action of the last turn, highlighted on the buttons
+results_time = 0
 
-# Function to draw buttons
+# Function to draw buttons (queued with the compositor, redrawn only when the highlight changes)
 def draw_buttons(selected_action, player):
     button_size = 50  #The width and height of each button.
     button_padding = 20  #The space between the bottom of the screen and the buttons.
@@ -137,358 +125,312 @@ def draw_buttons(selected_action, player):
     # Draw buttons for player 1
     if player == 1:
         for i, (x, y) in enumerate(button_positions):
-            pygame.draw.circle(screen, (0, 0, 0), (x + button_radius, y + button_radius), button_radius + 3, 2)  # Border with thickness 2 and radius btn_radius+3
-            if selected_action == i:
-                pygame.draw.circle(screen, (255, 255, 0), (x + button_radius, y + button_radius), button_radius)  # Highlight
-            screen.blit(button_images[i], (x, y))
+            compositor.item(("button", i), selected_action == i,
+                            functools.partial(draw_button, button_images[i], x, y, button_radius, selected_action == i))
+
+def draw_button(image, x, y, button_radius, selected):
+    pygame.draw.circle(screen, (0, 0, 0), (x + button_radius, y + button_radius), button_radius + 3, 2)  # Border with thickness 2 and radius btn_radius+3
+    if selected:
+        pygame.draw.circle(screen, (255, 255, 0), (x + button_radius, y + button_radius), button_radius)  # Highlight
+    screen.blit(image, (x, y))
+    return pygame.Rect(x - 3, y - 3, 2 * button_radius + 6, 2 * button_radius + 6)
+
+# Animations are tweens played by the animator while the game keeps running (see battle_render.py).
+# Each original frame lasted 20 ms, so an animation of n frames runs for 20 * n ms. The draw functions
+# return the Rect they blitted, so the compositor knows which parts of the screen to restore.
+FRAME_MS = 20
 
 # Function to animate attack
 def animate_attack(attacker_x, attacker_y, target_x, target_y, player, rotate=False):
     frames = 30
-    for i in range(frames):
-        ratio = i / frames
+    def draw(t):
+        ratio = frame_ratio(t, frames)
         size = int(50 + 150 * ratio)
         # Rotate the image if needed
-        if rotate and player == 2:
-            rotated_attack_img = pygame.transform.rotate(attack_btn_img, 180)
-            attack_img = pygame.transform.scale(rotated_attack_img, (size, size))
-        else:
-            attack_img = pygame.transform.scale(attack_btn_img, (size, size))
+        attack_img = sprite_cache.get(attack_btn_img, (size, size), 180 if rotate and player == 2 else 0)
         if player == 1:
             x = int(attacker_x + (target_x - attacker_x) * ratio)
             y = int(attacker_y + (target_y - attacker_y) * ratio)
         else:
             x = int(attacker_x + (target_x - attacker_x) * (1 - ratio))
             y = int(attacker_y + (target_y - attacker_y) * (1 - ratio))
-        screen.blit(attack_img, (x, y))
-        pygame.display.flip()
-        pygame.time.delay(20)
-        screen.blit(background_img, (0, 0))
-        screen.blit(character1_img, (char1_x, char1_y))
-        screen.blit(character2_img, (char2_x, char2_y))
-        draw_buttons(player1_action, player=1)
-    
+        return screen.blit(attack_img, (x, y))
+    animator.play(frames * FRAME_MS, draw)
+
 def animate_shield(player_x, player_y):
     shield_size = (150, 150)  # Adjust shield size
     shield_offset = (20, -20)  # Adjust shield offset
-    shield_img = pygame.transform.scale(defend_btn_img, shield_size)
-    
+    shield_img = sprite_cache.get(defend_btn_img, shield_size)
+
     # Calculate shield position
     shield_x = int(player_x + character2_img.get_width() // 2 - shield_size[0] // 2 + shield_offset[0])
     shield_y = int(player_y + character2_img.get_height() // 2 - shield_size[1] // 2 + shield_offset[1])
-    
-    # Draw the shield
-    screen.blit(shield_img, (shield_x, shield_y))
-    pygame.display.flip()
-    
-    # Pause for 2 seconds
-    pygame.time.delay(1000)
+
+    # Show the shield for a second
+    animator.play(1000, lambda t: screen.blit(shield_img, (shield_x, shield_y)))
 
 # Function to animate special power
 def animate_special_power(attacker_x, attacker_y, target_x, target_y, player):
     if player == 1:
         attacker_img = character1_img
-        opponent_img = character2_img
         direction = -1  # Move left for player 1
     else:
         attacker_img = character2_img
-        opponent_img = character1_img
         direction = 1   # Move right for player 2
 
     # Enlarge the attacker image
-    size = 0
-    for i in range(50):
-        size += 5
-        special_img = pygame.transform.scale(attacker_img, (size, size))
+    grow_frames = 50
+    def draw_enlarge(t):
+        size = 5 * (int(frame_ratio(t, grow_frames) * grow_frames) + 1)
+        special_img = sprite_cache.get(attacker_img, (size, size))
         x = int(attacker_x + direction * attacker_img.get_width() // 2 - size // 2)
         y = int(attacker_y + attacker_img.get_height() // 2 - size // 2)
-        screen.blit(special_img, (x, y))
-        pygame.display.flip()
-        pygame.time.delay(20)
-
-    # Draw the special power animation
-    for i in range(30):
-        ratio = i / 30
+        return screen.blit(special_img, (x, y))
+    animator.play(grow_frames * FRAME_MS, draw_enlarge)
+
+    # Then the special power flies to the target
+    size = 5 * grow_frames
+    shot_frames = 30
+    def draw_shot(t):
+        ratio = frame_ratio(t, shot_frames)
         x = int(attacker_x + direction * attacker_img.get_width() // 2 - size // 2 + (target_x - attacker_x) * ratio)
         y = int(attacker_y + attacker_img.get_height() // 2 - size // 2 + (target_y - attacker_y) * ratio)
-        special_img = pygame.transform.scale(special_btn_img, (50, 50))
-        screen.blit(special_img, (x, y))
-        pygame.display.flip()
-        pygame.time.delay(20)
-
-    # Remove the enlarged attacker image
-    screen.blit(background_img, (0, 0))
-    screen.blit(opponent_img, (target_x, target_y))
-    draw_buttons(player1_action, player=1)
-    
+        return screen.blit(sprite_cache.get(special_btn_img, (50, 50)), (x, y))
+    animator.play(shot_frames * FRAME_MS, draw_shot, delay=grow_frames * FRAME_MS)
+
 # Function to animate players entering the screen
 def animate_players_entering():
     frames = 30
-    for i in range(frames):
-        ratio = i / frames
+    def draw(t):
+        ratio = frame_ratio(t, frames)
         char1_current_x = int(ratio * (100 + character1_img.get_width()))  # Move from -width to 100
         char2_current_x = int(screen_width - ratio * (100 + character2_img.get_width()))  # Move from width to screen_width - 100
         screen.blit(start_background_img, (0, 0))  # Draw start screen background
         screen.blit(character1_img, (char1_current_x, char1_y))  # Draw character 1 entering from left
         screen.blit(character2_img, (char2_current_x, char2_y))  # Draw character 2 entering from right
-        pygame.display.flip()
-        pygame.time.delay(20)
+    animator.play(frames * FRAME_MS, draw)
+
+# Battle scene behind the HUD and the animations: the background with the characters on it, composed
+# once. Only the parts of the screen that changed are redrawn and sent to the display (see battle_render.py)
+battle_layer = background_img.copy()
+battle_layer.blit(character1_img, (char1_x, char1_y))
+battle_layer.blit(character2_img, (char2_x, char2_y))
+compositor = Compositor(screen, battle_layer)
+text_cache = TextCache(font)
+
+# Function to start the animations of one turn; they play while the game goes on
+def animate_turn(player1_action, player2_action, player1_gold, player2_gold):
+    char1_target = (char1_x + character1_img.get_width(), char1_y + character1_img.get_height() // 2)
+    char2_target = (char2_x, char2_y + character2_img.get_height() // 2)
+    if player1_action == A_ATTACK:
+        animate_attack(*char1_target, *char2_target, player=1)
+    elif player1_action == A_DEFEND:
+        animate_shield(char1_x, char1_y)
+    elif player1_action == A_SPECIAL_POWER:
+        if player1_gold < 50:
+            return  # Not enough gold, the turn does nothing
+        animate_special_power(*char1_target, *char2_target, player=1)
 
-# Function to handle events on the start screen
-def handle_start_screen_events():
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            # Check if the mouse click is within the bounds of the start button
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            button_rect = start_button_img.get_rect(topleft=(350, 400))
-            if button_rect.collidepoint(mouse_x, mouse_y):
-                return True  # Start button clicked
-    return False
-
-
-def calculate_optimal_payoff(player1_action, player2_action, player1_health, player2_health):    
-    damage = 0
     if player2_action == A_ATTACK:
-        damage = 10  # Assuming attack deals 10 damage
+        animate_attack(*char1_target, *char2_target, player=2, rotate = True)
+    elif player2_action == A_DEFEND:
+        animate_shield(char2_x, char2_y)
     elif player2_action == A_SPECIAL_POWER and player2_gold >= 50:
-        damage = 20
-
-    if player1_action == A_DEFEND:        
-        damage = max(0, damage - 5)  # Defend reduces attack damage by 5
-
-    return max(0, player1_health - damage )
-
-def calculate_regret(player1_action, player2_action, player1_health, player2_health):
-    # Calculate the payoff for player 1's action against each possible action of player 2
-    player1_payoffs = []
-    for action in [A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER]:
-        player1_payoff = calculate_optimal_payoff(player1_action, action, player1_health, player2_health)
-        player1_payoffs.append(player1_payoff)
-
-    # Calculate the maximum possible payoff for player 1 given player 2's action
-    min_player1_payoff = min(player1_payoffs)
-
-    # Calculate the payoff for player 2's actual action against player 1's actual action
-    actual_player1_payoff = calculate_optimal_payoff(player1_action, player2_action, player1_health, player2_health)
+        animate_special_power(char2_x + character2_img.get_width(), char2_y + character2_img.get_height() // 2,
+                              char1_x, char1_y + character1_img.get_height() // 2, player=2)
 
-    # Calculate the regret
-    regret = actual_player1_payoff - min_player1_payoff
-    return regret
+# Function to draw HUD text right-aligned at the right edge of the screen
+def blit_text_right(text, y):
+    text_img = text_cache.render(text, black)
+    return screen.blit(text_img, (screen_width - text_img.get_width() - 10, y))
 
-# Function to play start music
-def play_start_music():
-    bg_music.stop()
-    start_music.play()
-        
-# Load start button image and scale it down
-start_button_img = pygame.image.load("start_btn.png")
-start_button_img = pygame.transform.scale(start_button_img, (300, 200))
-
-# Main loop for start screen
-while True:
-    bg_music.play()
-    if handle_start_screen_events():        
-        play_start_music()
-        break  # Break out of the loop when the start button is clicked
-    
-    # Draw start screen background
-    screen.blit(start_background_img, (0, 0))
-    
-    # Draw start button
-    screen.blit(start_button_img, (250, 400))
-    
-    # Update display
-    pygame.display.flip()
-
-# Animate players entering the screen
-animate_players_entering()
-
-# Main game loop
-while True:
-    # Handle events
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        elif event.type == pygame.KEYDOWN:            
-            if event.key == pygame.K_j:
-                player1_action = A_ATTACK
-            elif event.key == pygame.K_k:
-                player1_action = A_DEFEND
-            elif event.key == pygame.K_l:
-                player1_action = A_BUILD_GOLD
-            elif event.key == pygame.K_i:
-                if player1_gold >= 50:
-                    player1_action = A_SPECIAL_POWER            
-
-    # Clear the screen
-    screen.fill((255, 255, 255))  # Fill screen with white color
-
-    # Draw background
-    screen.blit(background_img, (0, 0))
-
-    # Draw characters on top of background
-    screen.blit(character1_img, (char1_x, char1_y))
-    screen.blit(character2_img, (char2_x, char2_y))
-
-    # Draw health and gold bars for player 1
+# Function to queue the battle with the compositor: health and gold bars, HUD text, buttons and running animations
+def queue_battle():
+    # Health and gold bars for player 1
     player1_health_width = min(player1_health * (400 / 1000), 400)  # Scale health to fit within 400 pixels
-    pygame.draw.rect(screen, green, (10, 10, player1_health_width, 20))
-    pygame.draw.rect(screen, yellow, (10, 40, min(player1_gold * 2, 400), 20))  # Cap at 400 pixels width
+    player1_gold_width = min(player1_gold * 2, 400)  # Cap at 400 pixels width
+    compositor.item("player1_health_bar", player1_health_width,
+                    lambda: pygame.draw.rect(screen, green, (10, 10, player1_health_width, 20)))
+    compositor.item("player1_gold_bar", player1_gold_width,
+                    lambda: pygame.draw.rect(screen, yellow, (10, 40, player1_gold_width, 20)))
 
-    # Draw health and gold bars for player 2
+    # Health and gold bars for player 2
     player2_health_width = min(player2_health * (400 / 1000), 400)  # Scale health to fit within 400 pixels
-    pygame.draw.rect(screen, green, (screen_width - player2_health_width - 10, 10, player2_health_width, 20))
-    pygame.draw.rect(screen, yellow, (screen_width - min(player2_gold * 2, 400) - 10, 40, min(player2_gold * 2, 400), 20))  # Cap at 400 pixels width
-
-    # Render text
-    player1_health_text = font.render("Health: " + str(player1_health), True, black)
-    player1_gold_text = font.render("Gold: " + str(player1_gold), True, black)
-    player2_health_text = font.render("Health: " + str(player2_health), True, black)
-    player2_gold_text = font.render("Gold: " + str(player2_gold), True, black)
-
-    # Draw text on screen
-    screen.blit(player1_health_text, (10, 70))
-    screen.blit(player1_gold_text, (10, 100))
-    screen.blit(player2_health_text, (screen_width - player2_health_text.get_width() - 10, 70))
-    screen.blit(player2_gold_text, (screen_width - player2_gold_text.get_width() - 10, 100))
-
-    # Draw buttons for player 1
-    draw_buttons(player1_action, player=1)
+    player2_gold_width = min(player2_gold * 2, 400)  # Cap at 400 pixels width
+    compositor.item("player2_health_bar", player2_health_width,
+                    lambda: pygame.draw.rect(screen, green, (screen_width - player2_health_width - 10, 10, player2_health_width, 20)))
+    compositor.item("player2_gold_bar", player2_gold_width,
+                    lambda: pygame.draw.rect(screen, yellow, (screen_width - player2_gold_width - 10, 40, player2_gold_width, 20)))
+
+    # Text, rendered once per distinct value
+    player1_health_text = "Health: " + str(player1_health)
+    player1_gold_text = "Gold: " + str(player1_gold)
+    player2_health_text = "Health: " + str(player2_health)
+    player2_gold_text = "Gold: " + str(player2_gold)
+    compositor.item("player1_health_text", player1_health_text,
+                    lambda: screen.blit(text_cache.render(player1_health_text, black), (10, 70)))
+    compositor.item("player1_gold_text", player1_gold_text,
+                    lambda: screen.blit(text_cache.render(player1_gold_text, black), (10, 100)))
+    compositor.item("player2_health_text", player2_health_text, lambda: blit_text_right(player2_health_text, 70))
+    compositor.item("player2_gold_text", player2_gold_text, lambda: blit_text_right(player2_gold_text, 100))
+
+    # Buttons for player 1
+    draw_buttons(selected_action, player=1)
+
+    # The running animations on top of the scene
+    compositor.sprite(animator.draw)
+
+def draw_battle():
+    queue_battle()
+    return compositor.flush()
+
+# Function to handle the player's keys during the battle
+def battle_event(event):
+    global player1_action
+    if event.type == pygame.KEYDOWN:
+        if event.key == pygame.K_j:
+            player1_action = A_ATTACK
+        elif event.key == pygame.K_k:
+            player1_action = A_DEFEND
+        elif event.key == pygame.K_l:
+            player1_action = A_BUILD_GOLD
+        elif event.key == pygame.K_i:
+            if player1_gold >= 50:
+                player1_action = A_SPECIAL_POWER
+
+# One battle step per simulation step; a turn is played when player 1 has chosen an action
+def battle_update():
+    global player1_health, player1_gold, player2_health, player2_gold, player1_action, selected_action
+    global cumulative_regret, turn
 
     # Player 2's action selection (UCB)
-    player2_action = player2_bandit.pull_arm()    
+    with span("update:pull_arm"):
+        player2_action = player2_bandit.pull_arm()
     # Execute actions
-    if player1_action == A_ATTACK:
-        animate_attack(char1_x + character1_img.get_width(), char1_y + character1_img.get_height() // 2,
-                       char2_x, char2_y + character2_img.get_height() // 2, player=1)
-        
-        if player2_action == A_ATTACK:
-            player1_health -= 10
-            player2_health -= 10
-            player2_reward = 5
-            animate_attack(char1_x + character1_img.get_width(), char1_y + character1_img.get_height() // 2,
-                       char2_x, char2_y + character2_img.get_height() // 2, player=2, rotate = True)
-        elif player2_action == A_DEFEND:
-            player2_health -= 5
-            player2_reward = 20
-            animate_shield(char2_x, char2_y)
-        elif player2_action == A_BUILD_GOLD:
-            player2_gold += 10
-            player2_reward = 10
-        elif player2_action == A_SPECIAL_POWER:
-            if player2_gold >= 50:
-                animate_special_power(char2_x + character2_img.get_width(), char2_y + character2_img.get_height() // 2,
-                                       char1_x, char1_y + character1_img.get_height() // 2, player=2)
-                player1_health -= 20
-                player2_health -= 10
-                player2_reward = 25
-                player2_gold -= 50
-            else:                
-                player2_reward = 5
-                player2_health -= 10
-        
-    elif  player1_action == A_DEFEND:
-        animate_shield(char1_x, char1_y)
-        if player2_action == A_ATTACK:            
-            player2_reward = 5
-            animate_attack(char1_x + character1_img.get_width(), char1_y + character1_img.get_height() // 2,
-                       char2_x, char2_y + character2_img.get_height() // 2, player=2, rotate = True)
-        elif player2_action == A_DEFEND:
-            player1_health -= 5
-            player2_reward = 5
-            animate_shield(char2_x, char2_y)
-        elif player2_action == A_BUILD_GOLD:
-            player2_gold += 10
-            player2_reward = 5
-        elif player2_action == A_SPECIAL_POWER:
-            if player2_gold >= 50:
-                animate_special_power(char2_x + character2_img.get_width(), char2_y + character2_img.get_height() // 2,
-                                       char1_x, char1_y + character1_img.get_height() // 2, player=2)
-                player1_health -= 15
-                player2_reward = 25
-                player2_gold -= 50
-            else:                
-                player2_reward = 5                
-                
-    elif  player1_action == A_BUILD_GOLD:
-        player1_gold += 10
-        if player2_action == A_ATTACK:
-            player1_health -= 10    
-            player2_reward = 15   
-            animate_attack(char1_x + character1_img.get_width(), char1_y + character1_img.get_height() // 2,
-                       char2_x, char2_y + character2_img.get_height() // 2, player=2, rotate = True)             
-        elif player2_action == A_DEFEND:
-            player2_reward = 5
-            animate_shield(char2_x, char2_y)
-        elif player2_action == A_BUILD_GOLD:
-            player2_gold += 10
-            player2_reward = 10
-        elif player2_action == A_SPECIAL_POWER:
-            if player2_gold >= 50:
-                animate_special_power(char2_x + character2_img.get_width(), char2_y + character2_img.get_height() // 2,
-                                       char1_x, char1_y + character1_img.get_height() // 2, player=2)
-                player1_health -= 20
-                player2_reward = 25
-                player2_gold -= 50
-            else:                
-                player2_reward = 5                
-                
-    elif player1_action == A_SPECIAL_POWER and player1_gold >= 50:
-        player1_gold -= 50
-        animate_special_power(char1_x + character1_img.get_width(), char1_y + character1_img.get_height() // 2,
-                               char2_x, char2_y + character2_img.get_height() // 2, player=1)
-        if player2_action == A_ATTACK:
-            player1_health -= 10    
-            player2_health -= 20  
-            player2_reward = 5  
-            animate_attack(char1_x + character1_img.get_width(), char1_y + character1_img.get_height() // 2,
-                       char2_x, char2_y + character2_img.get_height() // 2, player=2, rotate = True)                            
-        elif player2_action == A_DEFEND:            
-            player2_health -= 15
-            player2_reward = 5
-            animate_shield(char2_x, char2_y)
-        elif player2_action == A_BUILD_GOLD:
-            player2_gold += 10
-            player2_health -= 20
-            player2_reward = 5
-        elif player2_action == A_SPECIAL_POWER:
-            if player2_gold >= 50:
-                animate_special_power(char2_x + character2_img.get_width(), char2_y + character2_img.get_height() // 2,
-                                       char1_x, char1_y + character1_img.get_height() // 2, player=2)
-                player1_health -= 20
-                player2_health -= 20
-                player2_reward = 25
-                player2_gold -= 50
-            else:                
-                player2_reward = 5
-                player2_health -= 20
+    selected_action = player1_action
+    if player1_action is not None:
+        with span("update:animate_turn"):
+            animate_turn(player1_action, player2_action, player1_gold, player2_gold)
+        with span("update:rules"):
+            health1_change, health2_change, gold1_change, gold2_change, player2_reward = rules.outcome(
+                player1_action, player2_action, player1_gold, player2_gold)
+            player1_health += health1_change
+            player2_health += health2_change
+            player1_gold += gold1_change
+            player2_gold += gold2_change
     else:
         player2_reward = 0
-    player1_action = None                   
-    
-    regret = calculate_regret(player1_action, player2_action, player1_health, player2_health)
-    cumulative_regret += regret
-    regret_player2.append(cumulative_regret)
+    player1_action = None
+
+    # player1_action was already cleared above, so always None here; no action counts as not defending,
+    # which is what A_ATTACK means to the regret table
+    with span("update:regret"):
+        regret = regret_table.regret(A_ATTACK, player2_action, player1_health, player1_gold, player2_gold)
+        cumulative_regret += regret
+        regret_player2.update(turn, cumulative_regret)
 
     # Update bandit for player 2 with reward
-    player2_bandit.update(player2_action, player2_reward)
+    with span("update:bandit_update"):
+        player2_bandit.update(player2_action, player2_reward)
+
+    # Decision log (GAME_LOG=<directory>), with the bandit's state every few turns
+    with span("update:log"):
+        decision_log.record(turn, player2_action, player2_reward, regret,
+                            player1_action=-1 if selected_action is None else selected_action,  # -1: no input
+                            player1_health=player1_health, player2_health=player2_health,
+                            player1_gold=player1_gold, player2_gold=player2_gold)
+        decision_log.snapshot(turn, player2_bandit)
+    turn += 1
+
+    # Advance the running animations by one step
+    with span("update:animations"):
+        animator.update(scheduler.step_ms)
 
     # Check if game should end
     if player1_health <= 0 or player2_health <= 0:
-        break
+        return "results"
+
+# Results screen: the last turn's animations play out, then the winner shows until a click or key,
+# or a few seconds have passed
+RESULTS_MS = 3000
+results_font = pygame.font.Font(None, 72)
+
+def results_update():
+    global results_time
+    if animator.busy:
+        animator.update(scheduler.step_ms)
+        return None
+    results_time += scheduler.step_ms
+    if results_time >= RESULTS_MS:
+        return DONE
+
+def results_event(event):
+    if not animator.busy and event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN):
+        return DONE
+
+def draw_results():
+    queue_battle()
+    if animator.busy:
+        return compositor.flush()
+    if player1_health <= 0 and player2_health <= 0:
+        message = "Draw!"
+    elif player2_health <= 0:
+        message = "Player 1 wins!"
+    else:
+        message = "Player 2 wins!"
+    text = results_font.render(message, True, red)
+    compositor.item("results", message, lambda: screen.blit(
+        text, (screen_width // 2 - text.get_width() // 2, screen_height // 2 - text.get_height() // 2)))
+    return compositor.flush()
+
+# Function to start the background music, once (it loops by itself)
+def start_screen_enter():
+    audio.play_music(bg_music, loops=-1)
+
+# Function to handle events on the start screen
+def start_screen_event(event):
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        # Check if the mouse click is within the bounds of the start button
+        mouse_x, mouse_y = pygame.mouse.get_pos()
+        button_rect = start_button_img.get_rect(topleft=(350, 400))
+        if button_rect.collidepoint(mouse_x, mouse_y):
+            play_start_music()  # Start button clicked
+            return "intro"
+
+def draw_start_screen():
+    # Draw start screen background
+    screen.blit(start_background_img, (0, 0))
 
-    # Update the display
-    pygame.display.flip()
+    # Draw start button
+    screen.blit(start_button_img, (250, 400))
+
+# The intro is one tween that repaints the whole screen, so the display is flipped every frame
+def draw_intro():
+    animator.draw()
 
-    # Cap the frame rate
-    pygame.time.Clock().tick(60)
+# The intro is one tween: the scene ends when it has played
+def intro_update():
+    animator.update(scheduler.step_ms)
+    if not animator.busy:
+        return "battle"
+
+# Function to play start music
+def play_start_music():
+    audio.play_music(start_music)  # Replaces the background music
+
+scheduler.add("start", Scene(enter=start_screen_enter, draw=draw_start_screen, handle_event=start_screen_event,
+                             idle=lambda: True))
+scheduler.add("intro", Scene(enter=animate_players_entering, update=intro_update, draw=draw_intro))
+scheduler.add("battle", Scene(enter=compositor.invalidate, update=battle_update, draw=draw_battle,
+                              handle_event=battle_event))
+scheduler.add("results", Scene(update=results_update, draw=draw_results, handle_event=results_event,
+                               idle=lambda: not animator.busy))
+scheduler.run("start")
+decision_log.close()
 
 # Plot regret for player 2
-plt.plot(regret_player2, label='Player 2 Regret')
+import matplotlib.pyplot as plt  # Only needed for the plot, so imported this late
+plt.plot(regret_player2.steps, regret_player2.mean, label='Player 2 Regret')
 plt.xlabel('Time')
 plt.ylabel('Regret')
 plt.title('Regret of Player 2 Over Time')
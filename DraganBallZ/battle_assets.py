@@ -0,0 +1,101 @@
+import hashlib
+import os
+import pygame
+
+# Loads the battle images once per launch in the display's pixel format, so blits do not convert
+# pixels on the fly. Backgrounds are loaded as single images; the small sprites (characters, buttons,
+# start button) are packed into one atlas surface and handed out as subsurfaces of it.
+#
+# The decoded and scaled pixels are kept in cache_dir (one raw file per image or atlas), keyed by the
+# file names, sizes and the source files' size and modification time, so later launches skip decoding
+# and scaling the large source images. A missing or unwritable cache directory just means no caching.
+# The display mode must be set before loading, convert() needs it.
+
+CACHE_VERSION = 1
+ATLAS_WIDTH = 1024
+
+class AssetManager:
+    def __init__(self, cache_dir=".asset_cache"):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, kind, entries):
+        # entries: [(path, (width, height)), ...]
+        digest = hashlib.sha1(f"{CACHE_VERSION} {kind}".encode())
+        for path, size in entries:
+            stat = os.stat(path)
+            digest.update(f"|{path} {size[0]}x{size[1]} {stat.st_size} {stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+
+    def _read(self, key, size):
+        # (surface, pixel format) from the cache, or (None, None)
+        if self.cache_dir is None:
+            return None, None
+        for fmt in ("RGBA", "RGB"):
+            try:
+                with open(os.path.join(self.cache_dir, f"{key}.{fmt.lower()}"), "rb") as f:
+                    return pygame.image.frombytes(f.read(), size, fmt), fmt
+            except (OSError, ValueError):
+                continue
+        return None, None
+
+    def _write(self, key, surface, fmt):
+        if self.cache_dir is None:
+            return
+        path = os.path.join(self.cache_dir, f"{key}.{fmt.lower()}")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(pygame.image.tobytes(surface, fmt))
+            os.replace(path + ".tmp", path)  # Never leave a half-written entry behind
+        except OSError:
+            pass
+
+    def image(self, path, size):
+        # One image scaled to size, e.g. a full-screen background
+        key = self._key("image", [(path, size)])
+        surface, fmt = self._read(key, size)
+        if surface is None:
+            self.misses += 1
+            surface = pygame.transform.scale(pygame.image.load(path), size)
+            fmt = "RGBA" if surface.get_flags() & pygame.SRCALPHA else "RGB"
+            self._write(key, surface, fmt)
+        else:
+            self.hits += 1
+        return surface.convert_alpha() if fmt == "RGBA" else surface.convert()
+
+    def sprites(self, entries):
+        # entries: [(path, (width, height)), ...] -> one surface per entry, all views into one atlas
+        rects, atlas_size = pack(entries)
+        key = self._key("atlas", entries)
+        atlas, _ = self._read(key, atlas_size)
+        if atlas is None:
+            self.misses += 1
+            atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+            for (path, size), rect in zip(entries, rects):
+                atlas.blit(pygame.transform.scale(pygame.image.load(path).convert_alpha(), size), rect)
+            self._write(key, atlas, "RGBA")
+        else:
+            self.hits += 1
+        atlas = atlas.convert_alpha()
+        return [atlas.subsurface(rect) for rect in rects]
+
+def pack(entries, width=ATLAS_WIDTH):
+    # Shelf packing: tallest sprites first, left to right in rows. Returns the Rect of every entry (in
+    # the order given) and the atlas size. Only the sizes matter, so a cached atlas can be sliced up
+    # without decoding anything.
+    order = sorted(range(len(entries)), key=lambda i: -entries[i][1][1])
+    rects = [None] * len(entries)
+    x = y = row_height = used_width = 0
+    for i in order:
+        w, h = entries[i][1]
+        if w > width:
+            raise ValueError(f"Sprite {entries[i][0]} is wider than the atlas")
+        if x + w > width:
+            x, y, row_height = 0, y + row_height, 0
+        rects[i] = pygame.Rect(x, y, w, h)
+        x += w
+        row_height = max(row_height, h)
+        used_width = max(used_width, x)
+    return rects, (used_width, y + row_height)
@@ -0,0 +1,56 @@
+import pygame
+
+# Sound for the battle scripts. Long tracks (the background and start music) are streamed from disk
+# with pygame.mixer.music instead of being decoded whole into a Sound at startup, which took a quarter
+# of a second and ~80 MB of RAM for the two tracks. Short effects are decoded once and cached as Sounds.
+# Without a working audio device everything is silently skipped.
+
+# 44.1 kHz, 16-bit stereo with a 512 sample buffer: ~12 ms from play() to sound
+MIXER_FREQUENCY = 44100
+MIXER_BUFFER = 512
+
+def pre_init_mixer(frequency=MIXER_FREQUENCY, buffer=MIXER_BUFFER):
+    # Must run before pygame.init(), which opens the mixer with these settings
+    pygame.mixer.pre_init(frequency, -16, 2, buffer)
+
+class AudioManager:
+    def __init__(self):
+        self.effects = {}
+        self.track = None  # Path of the track being streamed
+
+    @property
+    def enabled(self):
+        return pygame.mixer.get_init() is not None
+
+    def play_music(self, path, loops=0):
+        # Streams a track, only one plays at a time. Asking for the track that is already playing does
+        # nothing, so a scene can call this every time it starts without stacking the music.
+        if not self.enabled:
+            return
+        if self.track == path and pygame.mixer.music.get_busy():
+            return
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.play(loops)
+        self.track = path
+
+    def stop_music(self):
+        if self.enabled:
+            pygame.mixer.music.stop()
+        self.track = None
+
+    def effect(self, path):
+        sound = self.effects.get(path)
+        if sound is None:
+            sound = pygame.mixer.Sound(path)
+            self.effects[path] = sound
+        return sound
+
+    def play_effect(self, path):
+        if self.enabled:
+            return self.effect(path).play()
+
+    def preload(self, paths):
+        # Decode effects before the first frame instead of on their first play
+        if self.enabled:
+            for path in paths:
+                self.effect(path)
@@ -0,0 +1,56 @@
+import numpy as np
+
+#APS
+class BernoulliAPSBandit:
+    def __init__(self, n_arms, eta=0.08):        
+        self.n_arms = n_arms
+        self.eta = eta
+        self.exploration_weights = np.ones(n_arms)  # Initialize exploration weights uniformly
+        
+    def pull_arm(self):        
+        normalized_weights = self.exploration_weights / np.sum(self.exploration_weights)
+        cum_prob = np.cumsum(normalized_weights)
+        rand_num = np.random.rand()
+        location_index = next(i for i in range(len(cum_prob)) if cum_prob[i] > rand_num)
+        return location_index
+    
+    def update(self, chosen_location, reward):  
+        k = self.n_arms
+        w_t = self.exploration_weights[chosen_location]  # Weight before update
+        
+        # Ensuring w_t is never exactly 1 to avoid division by zero
+        w_t = np.clip(w_t, None, 0.9999)
+
+        if reward == 1:
+            self.exploration_weights[chosen_location] = (1 - np.exp(-self.eta)) / (1 - np.exp(-self.eta / w_t))
+        else:
+            self.exploration_weights[chosen_location] = (np.exp(self.eta) - 1) / (np.exp(self.eta / w_t) - 1)
+        
+        # Adjust other weights
+        for i in range(k):
+            if i != chosen_location:
+                # Protect against division by zero or undefined operations
+                try:
+                    adjustment = ((1 - self.exploration_weights[chosen_location]) / max(1 - w_t, 0.0001))
+                    self.exploration_weights[i] = np.clip(self.exploration_weights[i] * adjustment, 0.001, None)
+                except RuntimeWarning as e:
+                    print(f"Warning: {e}")
+
+#UCB
+class BernoulliUCBBandit:
+    def __init__(self, k):
+        self.k = k
+        self.q = np.zeros(k)  # Estimated probabilities of success
+        self.n = np.zeros(k)  # Times each arm has been pulled
+        self.total_pulls = 0
+
+    def pull_arm(self):
+        if self.total_pulls < self.k:  # Explore each arm once before using UCB
+            return self.total_pulls
+        ucb_values = self.q + np.sqrt(2 * np.log(self.total_pulls) / (self.n + 1e-10))  # UCB1 formula
+        return np.argmax(ucb_values)
+
+    def update(self, arm, reward):
+        self.n[arm] += 1
+        self.q[arm] += (reward - self.q[arm]) / self.n[arm]
+        self.total_pulls += 1
@@ -0,0 +1,308 @@
+import os
+import random
+import sys
+import numpy as np
+from collections import namedtuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.bandits import BatchedAPSBandit, BatchedUCBBandit
+from battle_minimax import solve
+from battle_regret import RegretTable
+from battle_rules import A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER, SPECIAL_POWER_COST, BattleRules
+
+# Headless battle engine: the same turn as the pygame scripts, with no display, images or music.
+# A battle is a BattleState plus step(); nothing lives in module globals, so any number of battles
+# can be simulated side by side to evaluate opponents offline.
+
+STARTING_HEALTH = 500
+STARTING_GOLD = 0
+
+_standard_rules = BattleRules("battle_APS")
+
+class BattleState:
+    __slots__ = ("player1_health", "player2_health", "player1_gold", "player2_gold")
+
+    def __init__(self, player1_health=STARTING_HEALTH, player2_health=STARTING_HEALTH,
+                 player1_gold=STARTING_GOLD, player2_gold=STARTING_GOLD):
+        self.player1_health = player1_health
+        self.player2_health = player2_health
+        self.player1_gold = player1_gold
+        self.player2_gold = player2_gold
+
+    def is_over(self):
+        # Same check as the end of every game loop
+        return self.player1_health <= 0 or self.player2_health <= 0
+
+    def winner(self):
+        # 1 or 2, 0 for a draw (both knocked out on the same turn), None while the battle is running
+        if not self.is_over():
+            return None
+        if self.player1_health <= 0 and self.player2_health <= 0:
+            return 0
+        return 1 if self.player2_health <= 0 else 2
+
+    def as_tuple(self):
+        return (self.player1_health, self.player2_health, self.player1_gold, self.player2_gold)
+
+    def __eq__(self, other):
+        return isinstance(other, BattleState) and self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        return ("BattleState(player1_health=%d, player2_health=%d, player1_gold=%d, player2_gold=%d)"
+                % self.as_tuple())
+
+def step(state, player1_action, player2_action, rules=_standard_rules):
+    # Pure transition: returns (next state, player 2's reward) and leaves state untouched
+    health1_change, health2_change, gold1_change, gold2_change, player2_reward = rules.outcome(
+        player1_action, player2_action, state.player1_gold, state.player2_gold)
+    return BattleState(state.player1_health + health1_change, state.player2_health + health2_change,
+                       state.player1_gold + gold1_change, state.player2_gold + gold2_change), player2_reward
+
+def affordable_actions(gold):
+    if gold >= SPECIAL_POWER_COST:
+        return (A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER)
+    return (A_ATTACK, A_DEFEND, A_BUILD_GOLD)
+
+def random_player1(state, rng=random):
+    # Player 1 of the scripts: uniform over the actions it can afford. Same distribution as the
+    # re-draw loop in the game, without the re-draws.
+    return rng.choice(affordable_actions(state.player1_gold))
+
+def play_battle(player2_bandit, player1_policy=random_player1, rules=_standard_rules, rng=None,
+                max_turns=100000):
+    # Plays one battle to the end against a bandit with pull_arm()/update() (battle_bandits.py).
+    # Returns (final state, number of turns, total player 2 reward).
+    if rng is None:
+        rng = random.Random()
+    state = BattleState()
+    turns = 0
+    total_reward = 0
+    while not state.is_over() and turns < max_turns:
+        player1_action = player1_policy(state, rng)
+        player2_action = player2_bandit.pull_arm()
+        state, player2_reward = step(state, player1_action, player2_action, rules)
+        player2_bandit.update(player2_action, player2_reward)
+        total_reward += player2_reward
+        turns += 1
+    return state, turns, total_reward
+
+# Batched engine: N battles in lockstep as int arrays, one row per battle. Battles end on different
+# turns, so finished rows are frozen with an active mask and dropped from the arrays (and from the
+# players' learners) once at most compact_below of the rows are still fighting.
+#
+# A batched player has pull_arm() -> one action per row, update(actions, rewards) and keep_rows(rows),
+# like the learners in common/bandits.py. Players that look at the battle also get
+# observe(health, opponent_health, gold, opponent_gold) before every pull_arm().
+
+# Per-battle arrays in the original battle order. winner is 1 or 2, 0 for a draw and -1 when the
+# battle was still running after max_turns. Regret is the scripts' per-turn regret, summed; player 1's
+# is the same measure seen from its seat.
+BattleResults = namedtuple("BattleResults", ["player1_health", "player2_health", "player1_gold", "player2_gold",
+                                             "turns", "player2_reward", "player1_regret", "player2_regret",
+                                             "winner"])
+
+def random_actions(gold, rng):
+    # Masked sampling: uniform over the 3 always-affordable actions, plus the special power (the last
+    # action) only where the player has the gold. Same distribution as the re-draw loop in the game.
+    return rng.integers(0, A_SPECIAL_POWER + (gold >= SPECIAL_POWER_COST))
+
+# Player 1 of the scripts: uniformly random among the actions it can afford
+class RandomPlayer:
+    def __init__(self, n_runs, rng=None):
+        self.n_runs = n_runs
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.gold = np.zeros(n_runs, dtype=np.int64)
+
+    def observe(self, health, opponent_health, gold, opponent_gold):
+        self.gold = gold
+
+    def pull_arm(self):
+        return random_actions(self.gold, self.rng)
+
+    def update(self, actions, rewards):
+        pass
+
+    def keep_rows(self, rows):
+        self.gold = self.gold[rows]
+        self.n_runs = len(self.gold)
+
+# Fixed heuristic opponent: special power whenever affordable, finish off an opponent within one
+# attack, otherwise build gold towards the next special power
+class ScriptedPlayer:
+    def __init__(self, n_runs):
+        self.n_runs = n_runs
+        self.opponent_health = np.full(n_runs, STARTING_HEALTH, dtype=np.int64)
+        self.gold = np.zeros(n_runs, dtype=np.int64)
+
+    def observe(self, health, opponent_health, gold, opponent_gold):
+        self.opponent_health = opponent_health
+        self.gold = gold
+
+    def pull_arm(self):
+        return np.where(self.gold >= SPECIAL_POWER_COST, A_SPECIAL_POWER,
+                        np.where(self.opponent_health <= 10, A_ATTACK, A_BUILD_GOLD))
+
+    def update(self, actions, rewards):
+        pass
+
+    def keep_rows(self, rows):
+        self.opponent_health = self.opponent_health[rows]
+        self.gold = self.gold[rows]
+        self.n_runs = len(self.gold)
+
+# Plays the mixed-strategy policy table of battle_minimax.py from its seat (1 or 2)
+class MinimaxPlayer:
+    def __init__(self, n_runs, table, seat, rng=None):
+        self.n_runs = n_runs
+        self.table = table
+        self.seat = seat
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.state = np.zeros((4, n_runs), dtype=np.int64)
+
+    def observe(self, health, opponent_health, gold, opponent_gold):
+        if self.seat == 1:
+            self.state = (health, opponent_health, gold, opponent_gold)
+        else:
+            self.state = (opponent_health, health, opponent_gold, gold)
+
+    def pull_arm(self):
+        _, player1_policy, player2_policy = self.table.lookup(*self.state)
+        # Sample from the state's probabilities, the cumulative sums are normalized so that an action
+        # with no probability (like a special power the player can't afford) is never drawn. Knocked
+        # out states have no policy and get action 0.
+        cumulative = np.cumsum(player1_policy if self.seat == 1 else player2_policy, axis=-1)
+        with np.errstate(invalid="ignore"):
+            cumulative /= cumulative[:, -1:]
+        return (cumulative <= self.rng.random(self.n_runs)[:, None]).sum(axis=-1)
+
+    def update(self, actions, rewards):
+        pass
+
+    def keep_rows(self, rows):
+        self.n_runs = len(np.arange(self.n_runs)[rows])
+
+def make_player(policy, n_battles, eta=0.08, rng=None, seat=2, rules=_standard_rules):
+    # "aps" (or "aps:<eta>"), "ucb", "random", "scripted" or "minimax" (or "minimax:<objective>")
+    name, _, param = policy.partition(":")
+    if name == "aps":
+        return BatchedAPSBandit(n_battles, 4, float(param) if param else eta, rng)
+    if name == "ucb":
+        return BatchedUCBBandit(n_battles, 4)
+    if name == "random":
+        return RandomPlayer(n_battles, rng)
+    if name == "scripted":
+        return ScriptedPlayer(n_battles)
+    if name == "minimax":
+        return MinimaxPlayer(n_battles, solve(rules.variant, param or "win"), seat, rng)
+    raise ValueError(f"Unknown policy: {policy}")
+
+def simulate_battles(n_battles, player2="aps", eta=0.08, rules=_standard_rules, seed=None, max_turns=100000,
+                     compact_below=0.5, player1="random"):
+    # Players are policy names for make_player (eta is the default APS learning rate) or batched
+    # players with n_battles rows. Player 1 has no reward of its own in the rules, a learning player 1
+    # is rewarded with what player 2 would get in its seat. A random or scripted player 1 gets neither
+    # rewards nor regret (its player1_regret is nan), nothing would read them.
+    rng = np.random.default_rng(seed)
+    if isinstance(player1, str):
+        player1 = make_player(player1, n_battles, eta, rng, 1, rules)
+    if isinstance(player2, str):
+        player2 = make_player(player2, n_battles, eta, rng, 2, rules)
+    observers = [(player, seat) for player, seat in ((player1, 0), (player2, 1)) if hasattr(player, "observe")]
+    player1_learns = not isinstance(player1, (RandomPlayer, ScriptedPlayer, MinimaxPlayer))
+    track_player1_regret = not isinstance(player1, (RandomPlayer, ScriptedPlayer))
+    regret_table = RegretTable(rules.variant)
+
+    state = np.empty((4, n_battles), dtype=np.int64)  # health1, health2, gold1, gold2 per row
+    state[:2] = STARTING_HEALTH
+    state[2:] = STARTING_GOLD
+    turns = np.zeros(n_battles, dtype=np.int64)
+    total_reward = np.zeros(n_battles, dtype=np.int64)
+    total_regret = np.zeros((2, n_battles), dtype=np.int64)
+    active = np.ones(n_battles, dtype=bool)
+    ids = np.arange(n_battles)  # Original battle index of every row
+
+    final_state = np.empty_like(state)
+    final_turns = np.empty_like(turns)
+    final_reward = np.empty_like(total_reward)
+    final_regret = np.empty_like(total_regret)
+
+    def flush(rows):
+        final_state[:, ids[rows]] = state[:, rows]
+        final_turns[ids[rows]] = turns[rows]
+        final_reward[ids[rows]] = total_reward[rows]
+        final_regret[:, ids[rows]] = total_regret[:, rows]
+
+    turn = 0
+    while len(ids) and turn < max_turns:
+        for player, seat in observers:
+            player.observe(state[seat], state[1 - seat], state[2 + seat], state[3 - seat])
+        player1_actions = player1.pull_arm()
+        player2_actions = player2.pull_arm()
+        if player1_learns:
+            player1_rewards = rules.player1_rewards(player1_actions, player2_actions, state[2], state[3])
+        changes = rules.outcomes(player1_actions, player2_actions, state[2], state[3])
+        changes *= active[:, None]  # Finished battles stay exactly where they ended
+        state += changes[:, :4].T
+        rewards = changes[:, 4]
+        # Learners of finished rows keep updating until the next compaction, nothing reads them
+        if player1_learns:
+            player1.update(player1_actions, player1_rewards)
+        player2.update(player2_actions, rewards)
+        total_reward += rewards
+        # Regret on the state after the turn, as the scripts do
+        if track_player1_regret:
+            total_regret[0] += regret_table.regrets(player2_actions, player1_actions, state[1], state[3],
+                                                    state[2]) * active
+        total_regret[1] += regret_table.regrets(player1_actions, player2_actions, state[0], state[2], state[3]) * active
+        turns += active
+        active &= (state[0] > 0) & (state[1] > 0)
+        turn += 1
+
+        n_active = np.count_nonzero(active)
+        if n_active <= compact_below * len(ids):
+            flush(~active)
+            state, turns = state[:, active], turns[active]
+            total_reward, total_regret = total_reward[active], total_regret[:, active]
+            ids = ids[active]
+            player1.keep_rows(active)
+            player2.keep_rows(active)
+            active = np.ones(n_active, dtype=bool)
+    flush(slice(None))
+
+    health1, health2 = final_state[0], final_state[1]
+    winner = np.full(n_battles, -1, dtype=np.int64)
+    winner[health2 <= 0] = 1
+    winner[health1 <= 0] = 2
+    winner[(health1 <= 0) & (health2 <= 0)] = 0
+    player1_regret = final_regret[0] if track_player1_regret else np.full(n_battles, np.nan)
+    return BattleResults(health1, health2, final_state[2], final_state[3], final_turns, final_reward,
+                         player1_regret, final_regret[1], winner)
+
+if __name__ == "__main__":
+    import time
+
+    # Throughput of the bare transition function, the cost per battle is roughly turns * this
+    rng = random.Random(0)
+    n_turns = 1000000
+    actions = [(rng.randrange(4), rng.randrange(4)) for _ in range(1000)]
+    start = time.perf_counter()
+    state = BattleState()
+    for i in range(n_turns):
+        player1_action, player2_action = actions[i % 1000]
+        state, _ = step(state, player1_action, player2_action)
+        if state.is_over():
+            state = BattleState()
+    elapsed = time.perf_counter() - start
+    print(f"{n_turns / elapsed:,.0f} turns/s")
+
+    n_battles = 100000
+    start = time.perf_counter()
+    results = simulate_battles(n_battles, "aps", seed=0)
+    elapsed = time.perf_counter() - start
+    print(f"{n_battles} APS battles in {elapsed:.2f}s, {results.turns.sum() / elapsed:,.0f} turns/s, "
+          f"mean length {results.turns.mean():.1f}, player 2 win rate {np.mean(results.winner == 2):.3f}, "
+          f"mean regret {results.player2_regret.mean():.1f}")
@@ -0,0 +1,303 @@
+import argparse
+import functools
+import itertools
+import numpy as np
+
+from battle_rules import A_SPECIAL_POWER, SPECIAL_POWER_COST, BattleRules, RULE_VARIANTS
+
+# Offline solver for the whole battle over the (health1, health2, gold1, gold2) lattice. Player 2
+# maximizes and player 1 minimizes one of two objectives:
+#   "win": +1 when player 2 wins, -1 when player 1 wins, 0 for a draw
+#   "reward": player 2's total reward from the rules
+# discounted by gamma per turn (so stalling forever is worth nothing).
+#
+# Both players move at the same time, so every state is a 4x4 zero-sum matrix game (player 1 only
+# picks among the actions it can afford, as in the game), solved exactly over mixed strategies: the
+# table holds the value of the game and both players' optimal action probabilities in every state.
+# A matrix game's optimal strategies can be read off a square kernel of the matrix (Shapley-Snow), so
+# each batch of games is solved by checking pure saddle points, then every 2x2 kernel in closed form,
+# then the 3x3 and 4x4 kernels of the games still open, keeping the first one whose strategies are an
+# equilibrium (both players' guaranteed payoffs meet). Nearly degenerate games, whose kernels are all
+# ill-conditioned, take their best kernel as long as the guarantees are within 1e-6 of each other.
+#
+# Health never goes up and, while it stays the same, gold never goes down, so the states are solved
+# in waves: by total health ascending, then total gold descending. Every wave only depends on waves
+# that are already in the table (memoized) plus itself through self-loops. A self-loop makes a state's
+# game depend on its own value V, so V is the root of val(game(V)) - V, which falls with slope between
+# -1 and gamma - 1; it is found by Newton's method (the slope comes from the optimal strategies) kept
+# inside a bisection bracket, for the whole wave at once. Gold above gold_cap is clipped, as if the
+# excess were lost.
+
+# Index of a state: (health1 // health_step, health2 // health_step, gold1 // gold_step, gold2 // gold_step),
+# health index 0 stands for a knocked out player (health <= 0)
+class MinimaxTable:
+    def __init__(self, value, policy1, policy2, health_step, gold_step, variant, objective, gamma):
+        self.value = value
+        self.policy1 = policy1  # Player 1's action probabilities per state, shape (..., 4)
+        self.policy2 = policy2  # Player 2's action probabilities per state
+        self.health_step = health_step
+        self.gold_step = gold_step
+        self.variant = variant
+        self.objective = objective
+        self.gamma = gamma
+        self.rules = BattleRules(variant)
+
+    @property
+    def gold_cap(self):
+        return (self.value.shape[2] - 1) * self.gold_step
+
+    def index(self, player1_health, player2_health, player1_gold, player2_gold):
+        last_gold = self.value.shape[2] - 1
+        return (np.maximum(player1_health, 0) // self.health_step, np.maximum(player2_health, 0) // self.health_step,
+                np.minimum(player1_gold // self.gold_step, last_gold),
+                np.minimum(player2_gold // self.gold_step, last_gold))
+
+    def lookup(self, player1_health, player2_health, player1_gold, player2_gold):
+        # (value, player 1 probabilities, player 2 probabilities); works on scalars and arrays alike
+        idx = self.index(player1_health, player2_health, player1_gold, player2_gold)
+        return self.value[idx], self.policy1[idx], self.policy2[idx]
+
+    def action_values(self, player1_health, player2_health, player1_gold, player2_gold):
+        # (..., p1 action, p2 action) matrix of the game at these states
+        idx = self.index(*np.broadcast_arrays(*(np.atleast_1d(v) for v in (
+            player1_health, player2_health, player1_gold, player2_gold))))
+        values, rewards = _action_values(self.rules, self.value, idx, self.health_step, self.gold_step,
+                                         self.objective, self.gamma)
+        values = np.where(np.isnan(values), rewards + self.gamma * self.value[idx][:, None, None], values)
+        return values.reshape(np.shape(player1_health) + (4, 4))
+
+    def regrets(self, player1_actions, player2_actions, player1_health, player2_health, player1_gold, player2_gold):
+        # Player 2's regret against the actual player 1 action: best value in hindsight minus the value
+        # of the action played, with the state before the turn
+        values = self.action_values(player1_health, player2_health, player1_gold, player2_gold)
+        row = np.take_along_axis(values, np.asarray(player1_actions)[..., None, None], axis=-2)[..., 0, :]
+        return row.max(axis=-1) - np.take_along_axis(row, np.asarray(player2_actions)[..., None], axis=-1)[..., 0]
+
+    def save(self, path):
+        np.savez_compressed(path, value=self.value, policy1=self.policy1, policy2=self.policy2,
+                            meta=np.array([self.health_step, self.gold_step]), variant=self.variant,
+                            objective=self.objective, gamma=self.gamma)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            health_step, gold_step = data["meta"]
+            return cls(data["value"], data["policy1"], data["policy2"], int(health_step), int(gold_step),
+                       str(data["variant"]), str(data["objective"]), float(data["gamma"]))
+
+def _action_values(rules, value, idx, health_step, gold_step, objective, gamma):
+    # Values of the 16 action pairs at the states idx, shape (m, 4, 4), plus the immediate rewards.
+    # Self-loops are NaN and resolved by the caller.
+    i1, i2, j1, j2 = idx
+    afford1 = (j1 * gold_step >= SPECIAL_POWER_COST).astype(np.intp)
+    afford2 = (j2 * gold_step >= SPECIAL_POWER_COST).astype(np.intp)
+    changes = np.moveaxis(rules.table[:, :, afford1, afford2], 2, 0)  # (m, 4, 4, 5)
+    if objective == "reward":
+        rewards = changes[..., rules.REWARD].astype(float)
+    else:
+        rewards = np.zeros(changes.shape[:3])
+
+    last_gold = value.shape[2] - 1
+    n1 = np.maximum(i1[:, None, None] + changes[..., rules.HEALTH1] // health_step, 0)
+    n2 = np.maximum(i2[:, None, None] + changes[..., rules.HEALTH2] // health_step, 0)
+    m1 = np.clip(j1[:, None, None] + changes[..., rules.GOLD1] // gold_step, 0, last_gold)
+    m2 = np.clip(j2[:, None, None] + changes[..., rules.GOLD2] // gold_step, 0, last_gold)
+    loops = (n1 == i1[:, None, None]) & (n2 == i2[:, None, None]) & (m1 == j1[:, None, None]) & (m2 == j2[:, None, None])
+    values = rewards + gamma * value[n1, n2, m1, m2]
+    values[loops] = np.nan
+    # Like the game's player 1, the solver's never plays the special power without the gold for it
+    values[afford1 == 0, A_SPECIAL_POWER] = np.inf
+    return values, rewards
+
+# Row (or column) subsets of every size, as (n, k) index arrays, and all (rows, columns) pairs of them
+_SUBSETS = {k: np.array(list(itertools.combinations(range(4), k))) for k in range(1, 5)}
+_KERNELS = {k: (np.repeat(_SUBSETS[k], len(_SUBSETS[k]), axis=0), np.tile(_SUBSETS[k], (len(_SUBSETS[k]), 1)))
+            for k in range(1, 5)}
+
+def _kernel_solutions(games, k):
+    # Candidate (value, x, y) of every k x k kernel of every game: (m, n), (m, n, k), (m, n, k)
+    rows, cols = _KERNELS[k]
+    kernels = games[:, rows[:, :, None], cols[:, None, :]]  # (m, n, k, k)
+    if k == 2:
+        a, b, c, d = kernels[..., 0, 0], kernels[..., 0, 1], kernels[..., 1, 0], kernels[..., 1, 1]
+        denominator = a - b - c + d
+        denominator = np.where(denominator == 0, np.nan, denominator)  # No mixed solution on this kernel
+        x = (d - c) / denominator
+        y = (d - b) / denominator
+        return (a * d - b * c) / denominator, np.stack([x, 1 - x], -1), np.stack([y, 1 - y], -1)
+    # Bordered system [[M, -1], [1, 0]]: its inverse's last column is (y, value), its last row (-x, value)
+    bordered = np.zeros(kernels.shape[:2] + (k + 1, k + 1))
+    bordered[..., :k, :k] = kernels
+    bordered[..., :k, k] = -1
+    bordered[..., k, :k] = 1
+    scale = 1 + np.abs(games).max(axis=(1, 2))[:, None]
+    singular = np.abs(np.linalg.det(bordered)) <= 1e-14 * scale ** (k - 1)
+    bordered[singular] = np.eye(k + 1)  # Solved anyway, flagged below
+    inverse = np.linalg.inv(bordered)
+    value = np.where(singular, np.nan, inverse[..., k, k])
+    return value, -inverse[..., k, :k], inverse[..., :k, k]
+
+def _solve_games(games):
+    # Value and optimal mixed strategies of the zero-sum games (m, 4, 4), player 1 picking the row and
+    # minimizing, player 2 the column and maximizing: (value (m,), x (m, 4), y (m, 4))
+    m = len(games)
+    value = np.empty(m)
+    x = np.zeros((m, 4))
+    y = np.zeros((m, 4))
+    scale = 1 + np.abs(games).max(axis=(1, 2))
+
+    # Pure saddle points: player 2's best worst case equals player 1's
+    upper = games.max(axis=2)
+    lower = games.min(axis=1)
+    saddle = upper.min(axis=1) - lower.max(axis=1) <= 1e-9 * scale
+    value[saddle] = lower[saddle].max(axis=1)
+    x[saddle, upper[saddle].argmin(axis=1)] = 1
+    y[saddle, lower[saddle].argmax(axis=1)] = 1
+
+    # Every kernel's strategies are certified by the gap between what they guarantee each player:
+    # player 2's worst row against y and player 1's worst column against x bracket the value. Nearly
+    # degenerate games only have ill-conditioned kernels, so they settle for their best one at the end.
+    todo = np.flatnonzero(~saddle)
+    best_gap = np.full(m, np.inf)
+    best = (np.empty(m), np.empty((m, 4)), np.empty((m, 4)))
+    for k in (2, 3, 4):
+        if not len(todo):
+            break
+        kernel_rows, kernel_cols = _KERNELS[k]
+        open_games = games[todo]
+        _, kernel_x, kernel_y = _kernel_solutions(open_games, k)
+        full_x = np.zeros(kernel_x.shape[:2] + (4,))
+        full_y = np.zeros(kernel_y.shape[:2] + (4,))
+        np.put_along_axis(full_x, np.broadcast_to(kernel_rows, kernel_x.shape), kernel_x, axis=-1)
+        np.put_along_axis(full_y, np.broadcast_to(kernel_cols, kernel_y.shape), kernel_y, axis=-1)
+        with np.errstate(invalid="ignore"):
+            proper = (full_x >= -1e-6).all(-1) & (full_y >= -1e-6).all(-1)
+            full_x = np.clip(full_x, 0, None)
+            full_y = np.clip(full_y, 0, None)
+            full_x /= full_x.sum(-1, keepdims=True)
+            full_y /= full_y.sum(-1, keepdims=True)
+            guaranteed2 = (open_games[:, None] @ full_y[..., None])[..., 0].min(-1)
+            guaranteed1 = (full_x[..., None, :] @ open_games[:, None])[..., 0, :].max(-1)
+        gap = np.where(proper & ~np.isnan(guaranteed1 + guaranteed2), guaranteed1 - guaranteed2, np.inf)
+
+        pick = gap.argmin(axis=1)
+        rows = np.arange(len(todo))
+        better = gap[rows, pick] < best_gap[todo]
+        improved = todo[better]
+        best_gap[improved] = gap[rows, pick][better]
+        best[0][improved] = (guaranteed1 + guaranteed2)[rows, pick][better] / 2
+        best[1][improved] = full_x[rows, pick][better]
+        best[2][improved] = full_y[rows, pick][better]
+        todo = todo[best_gap[todo] > 1e-9 * scale[todo]]
+
+    solved = np.flatnonzero(~saddle)
+    if (best_gap[solved] > 1e-6 * scale[solved]).any():
+        raise RuntimeError(f"No equilibrium found for {(best_gap[solved] > 1e-6 * scale[solved]).sum()} matrix games")
+    value[solved], x[solved], y[solved] = best[0][solved], best[1][solved], best[2][solved]
+    return value, x, y
+
+def _solve_wave(values, rewards, gamma, max_iterations=200):
+    # Solves the wave's games with each state's self-loops worth reward + gamma * (the state's own value)
+    loops = np.isnan(values)
+    unplayable = np.isinf(values)
+    fixed = np.where(loops | unplayable, 0.0, values)
+    # The value lies between the smallest and largest entry, with self-loops held forever
+    candidates = np.where(loops, rewards / (1 - gamma), values)
+    low = np.where(unplayable, np.inf, candidates).min(axis=(1, 2))
+    high = np.where(unplayable, -np.inf, candidates).max(axis=(1, 2))
+
+    m = len(values)
+    value = np.empty(m)
+    x = np.empty((m, 4))
+    y = np.empty((m, 4))
+    guess = low.copy()
+    active = np.arange(m)
+    for _ in range(max_iterations):
+        games = np.where(loops[active], rewards[active] + gamma * guess[active, None, None], fixed[active])
+        # A row player 1 cannot afford is made worse for it than any playable one, so it is never played
+        worst = np.where(unplayable[active], -np.inf, games).max(axis=(1, 2)) + 1
+        games = np.where(unplayable[active], worst[:, None, None], games)
+        game_value, game_x, game_y = _solve_games(games)
+
+        # val(game(V)) - V is decreasing: keep the root bracketed, step by Newton, bisect if it leaves
+        error = game_value - guess[active]
+        low[active] = np.where(error > 0, guess[active], low[active])
+        high[active] = np.where(error < 0, guess[active], high[active])
+        tolerance = 1e-11 * (1 + np.abs(game_value))
+        done = (np.abs(error) <= tolerance) | (high[active] - low[active] <= tolerance)
+        value[active[done]] = game_value[done]
+        x[active[done]] = game_x[done]
+        y[active[done]] = game_y[done]
+
+        slope = 1 - gamma * np.einsum("mi,mij,mj->m", game_x, loops[active], game_y)
+        step = guess[active] + error / slope
+        inside = (step > low[active]) & (step < high[active])
+        guess[active] = np.where(inside, step, (low[active] + high[active]) / 2)
+        active = active[~done]
+        if not len(active):
+            return value, x, y
+    raise RuntimeError(f"Self-loop values of {len(active)} states did not converge")
+
+def _check_rules(rules, health_step, gold_step):
+    table = rules.table
+    health = table[..., rules.HEALTH1] + table[..., rules.HEALTH2]
+    gold = table[..., rules.GOLD1] + table[..., rules.GOLD2]
+    if (table[..., :2] > 0).any() or ((health == 0) & (gold < 0)).any():
+        raise ValueError("Rules must never raise health or lower gold without damage")
+    if (table[..., :2] % health_step).any() or (table[..., 2:4] % gold_step).any():
+        raise ValueError("Rule changes must be multiples of the lattice steps")
+
+@functools.lru_cache(maxsize=None)
+def solve(variant="battle_APS", objective="win", gamma=0.99, gold_cap=100, starting_health=500,
+          health_step=5, gold_step=10):
+    if objective not in ("win", "reward"):
+        raise ValueError(f"Unknown objective: {objective}")
+    if not 0 < gamma < 1:
+        raise ValueError("gamma must be in (0, 1)")
+    rules = BattleRules(variant)
+    _check_rules(rules, health_step, gold_step)
+
+    n_health = starting_health // health_step
+    n_gold = gold_cap // gold_step + 1
+    shape = (n_health + 1, n_health + 1, n_gold, n_gold)
+    value = np.zeros(shape)
+    if objective == "win":
+        value[0, 1:] = 1.0   # Player 1 knocked out: player 2 wins
+        value[1:, 0] = -1.0
+    policy1 = np.zeros(shape + (4,), dtype=np.float32)  # Knocked out states keep all zeros
+    policy2 = np.zeros(shape + (4,), dtype=np.float32)
+
+    # All live states, in waves of (total health ascending, total gold descending)
+    i1, i2, j1, j2 = (axis.ravel() for axis in np.meshgrid(
+        np.arange(1, n_health + 1), np.arange(1, n_health + 1), np.arange(n_gold), np.arange(n_gold), indexing="ij"))
+    wave = (i1 + i2) * (2 * n_gold) + (2 * n_gold - 1 - (j1 + j2))
+    order = np.argsort(wave, kind="stable")
+    i1, i2, j1, j2, wave = i1[order], i2[order], j1[order], j2[order], wave[order]
+    bounds = np.flatnonzero(np.diff(wave)) + 1
+
+    for start, stop in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(wave)]])):
+        idx = (i1[start:stop], i2[start:stop], j1[start:stop], j2[start:stop])
+        values, rewards = _action_values(rules, value, idx, health_step, gold_step, objective, gamma)
+        value[idx], policy1[idx], policy2[idx] = _solve_wave(values, rewards, gamma)
+
+    return MinimaxTable(value, policy1, policy2, health_step, gold_step, variant, objective, gamma)
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Solve the battle by dynamic programming")
+    parser.add_argument("--rules", choices=sorted(RULE_VARIANTS), default="battle_APS")
+    parser.add_argument("--objective", choices=["win", "reward"], default="win")
+    parser.add_argument("--gamma", type=float, default=0.99)
+    parser.add_argument("--gold-cap", type=int, default=100)
+    parser.add_argument("--save", default=None, help="Write the table to this .npz file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = solve(args.rules, args.objective, args.gamma, args.gold_cap)
+    print(f"Solved {table.value[1:, 1:].size} states in {time.perf_counter() - start:.1f}s")
+    value, policy1, policy2 = table.lookup(500, 500, 0, 0)
+    print(f"Value of the opening for player 2: {value:.4f}, player 1 plays {np.round(policy1, 3)}, "
+          f"player 2 plays {np.round(policy2, 3)}")
+    if args.save:
+        table.save(args.save)
@@ -0,0 +1,88 @@
+import numpy as np
+
+from battle_rules import A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER, ACTIONS, SPECIAL_POWER_COST
+
+# Player 2's regret as the scripts compute it (calculate_regret / calculate_optimal_payoff),
+# precomputed into one table so every turn is a single lookup. Both regret models only look at a few
+# coarse features of the state, which become the table's state bucket:
+#   "damage" (battle_APS, battle_UCB, battle_APS_human): player 1's health after the damage player 2
+#       could deal, floored at 0. Only health below MAX_DAMAGE changes the result, so health is
+#       clipped to 0..MAX_DAMAGE, plus whether player 2 can afford the special power.
+#   "payoff" (temp): fixed payoffs per action pair, plus whether each player can afford the special.
+# Like the scripts, pass the state after the turn has been applied.
+
+MAX_DAMAGE = 20
+REGRET_MODELS = {
+    "battle_APS": "damage",
+    "battle_UCB": "damage",
+    "battle_APS_human": "damage",
+    "temp": "payoff",
+}
+
+def _damage_payoff(player1_action, player2_action, player1_health, player2_gold):
+    damage = 0
+    if player2_action == A_ATTACK:
+        damage = 10
+    elif player2_action == A_SPECIAL_POWER and player2_gold >= SPECIAL_POWER_COST:
+        damage = 20
+
+    if player1_action == A_DEFEND:
+        damage = max(0, damage - 5)  # Defend reduces attack damage by 5
+
+    return max(0, player1_health - damage)
+
+# temp.py's payoffs: (player 2 action, player 1 action) -> payoff, special power of player 1 as
+# (with gold, without gold). Player 2's special power without gold pays nothing.
+_FIXED_PAYOFFS = {
+    A_ATTACK: {A_ATTACK: 5, A_DEFEND: 5, A_BUILD_GOLD: 15, A_SPECIAL_POWER: (5, 10)},
+    A_DEFEND: {A_ATTACK: 20, A_DEFEND: 5, A_BUILD_GOLD: 5, A_SPECIAL_POWER: (5, 10)},
+    A_BUILD_GOLD: {A_ATTACK: 10, A_DEFEND: 5, A_BUILD_GOLD: 10, A_SPECIAL_POWER: (5, 10)},
+    A_SPECIAL_POWER: {A_ATTACK: 25, A_DEFEND: 25, A_BUILD_GOLD: 25, A_SPECIAL_POWER: (25, 15)},
+}
+
+def _fixed_payoff(player1_action, player2_action, player1_gold, player2_gold):
+    if player2_action == A_SPECIAL_POWER and player2_gold < SPECIAL_POWER_COST:
+        return 0
+    payoff = _FIXED_PAYOFFS[player2_action][player1_action]
+    if player1_action == A_SPECIAL_POWER:
+        payoff = payoff[0] if player1_gold >= SPECIAL_POWER_COST else payoff[1]
+    return payoff
+
+# Indexed by (p1 action, p1 can use special, p2 can use special, clipped p1 health, p2 action)
+class RegretTable:
+    def __init__(self, variant="battle_APS"):
+        self.variant = variant
+        self.model = REGRET_MODELS[variant]
+        # Player 1's payoff vector over player 2's actions for every (state bucket, p1 action)
+        self.payoffs = np.zeros((4, 2, 2, MAX_DAMAGE + 1, 4), dtype=np.int64)
+        for a1 in ACTIONS:
+            for g1 in (0, 1):
+                for g2 in (0, 1):
+                    for health in range(MAX_DAMAGE + 1):
+                        for a2 in ACTIONS:
+                            if self.model == "damage":
+                                payoff = _damage_payoff(a1, a2, health, g2 * SPECIAL_POWER_COST)
+                            else:
+                                payoff = _fixed_payoff(a1, a2, g1 * SPECIAL_POWER_COST, g2 * SPECIAL_POWER_COST)
+                            self.payoffs[a1, g1, g2, health, a2] = payoff
+
+        # damage: actual payoff minus the smallest one, temp: actual payoff minus the largest one
+        if self.model == "damage":
+            best = self.payoffs.min(axis=-1, keepdims=True)
+        else:
+            best = self.payoffs.max(axis=-1, keepdims=True)
+        self.table = self.payoffs - best
+        self._regrets = self.table.tolist()  # Plain ints for the scalar path
+
+    def regret(self, player1_action, player2_action, player1_health, player1_gold, player2_gold):
+        health = min(max(player1_health, 0), MAX_DAMAGE)
+        return self._regrets[player1_action][int(player1_gold >= SPECIAL_POWER_COST)][
+            int(player2_gold >= SPECIAL_POWER_COST)][health][player2_action]
+
+    def regrets(self, player1_actions, player2_actions, player1_health, player1_gold, player2_gold):
+        # Batched lookup, one regret per turn (or per battle)
+        return self.table[player1_actions,
+                          (np.asarray(player1_gold) >= SPECIAL_POWER_COST).astype(np.intp),
+                          (np.asarray(player2_gold) >= SPECIAL_POWER_COST).astype(np.intp),
+                          np.clip(player1_health, 0, MAX_DAMAGE),
+                          player2_actions]
@@ -0,0 +1,185 @@
+from collections import OrderedDict
+import pygame
+
+# Memo of scaled/rotated sprites for the battle animations. Every animation frame asks for the
+# same few (image, size, angle) combinations over and over, so each transform is done once and
+# later frames just blit the stored surface. Least recently used entries are dropped past max_entries.
+class SpriteCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image, size, angle=0):
+        # Same result as pygame.transform.scale(pygame.transform.rotate(image, angle), size)
+        key = (id(image), size, angle)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is image:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        surface = pygame.transform.rotate(image, angle) if angle else image
+        surface = pygame.transform.scale(surface, size)
+        # Keep the source image alive with its entry so its id() cannot be reused by another surface
+        self.entries[key] = (image, surface)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+    def warm(self, image, sizes, angle=0):
+        # Precompute a whole animation's frames up front, e.g. before the first turn
+        for size in sizes:
+            self.get(image, size, angle)
+
+    def clear(self):
+        self.entries.clear()
+
+# Non-blocking animations. A tween calls draw(t) once per frame with t running from 0 to 1 over
+# duration milliseconds (after an optional delay); the main loop draws all running tweens on top of
+# the scene and then advances them by the frame time, so several effects can play at once while
+# input and the AI keep going.
+class Tween:
+    def __init__(self, duration, draw, delay=0):
+        self.duration = duration
+        self.draw = draw
+        self.elapsed = -delay
+
+    @property
+    def started(self):
+        return self.elapsed >= 0
+
+    @property
+    def done(self):
+        return self.elapsed >= self.duration
+
+class Animator:
+    def __init__(self):
+        self.tweens = []
+
+    def play(self, duration, draw, delay=0):
+        tween = Tween(duration, draw, delay)
+        self.tweens.append(tween)
+        return tween
+
+    @property
+    def busy(self):
+        return bool(self.tweens)
+
+    def draw(self):
+        # Returns the screen areas drawn on (the Rects the tweens' draw functions return)
+        rects = []
+        for tween in self.tweens:
+            if tween.started:
+                rect = tween.draw(tween.elapsed / tween.duration)
+                if rect is not None:
+                    rects.append(rect)
+        return rects
+
+    def update(self, dt):
+        for tween in self.tweens:
+            tween.elapsed += dt
+        self.tweens = [tween for tween in self.tweens if not tween.done]
+
+def frame_ratio(t, frames):
+    # Snaps t to the frame grid of the original frame-by-frame animations (i / frames), so the
+    # animations keep their look and only ever ask the SpriteCache for the same sizes
+    return min(int(t * frames), frames - 1) / frames
+
+# Rendered text surfaces keyed by (text, color): HUD strings like "Health: 490" only change when the
+# value does, so most frames reuse a surface instead of calling font.render
+class TextCache:
+    def __init__(self, font, max_entries=128):
+        self.font = font
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.entries.get(key)
+        if surface is None:
+            surface = self.font.render(text, True, color)
+            self.entries[key] = surface
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return surface
+
+# Dirty-rectangle compositing over a static background (the battle background with the characters
+# already on it). Every frame the scene declares its HUD items, each with a key (the value it shows)
+# and a draw function returning the Rect it covered, plus sprites that move every frame. flush() then
+# only redraws items whose key changed, restores the background where last frame's sprites were and
+# returns the changed areas for pygame.display.update(). HUD items must not overlap each other.
+class Compositor:
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.bounds = screen.get_rect()
+        self.items = {}  # name -> (key, Rect, draw) as last drawn
+        self.sprite_rects = []
+        self.queued_items = []
+        self.queued_sprites = []
+        self.full = True
+
+    def invalidate(self):
+        # Repaint everything on the next flush (e.g. when the scene was covered by another one)
+        self.full = True
+
+    def item(self, name, key, draw):
+        self.queued_items.append((name, key, draw))
+
+    def sprite(self, draw):
+        # draw returns a Rect, a list of Rects or None
+        self.queued_sprites.append(draw)
+
+    def _restore(self, rect):
+        rect = rect.clip(self.bounds)
+        if rect.width and rect.height:
+            self.screen.blit(self.background, rect, rect)
+        return rect
+
+    def flush(self):
+        queued_items, self.queued_items = self.queued_items, []
+        queued_sprites, self.queued_sprites = self.queued_sprites, []
+        if self.full:
+            self.screen.blit(self.background, (0, 0))
+            dirty = [self.bounds]
+            restored = []
+            changed = queued_items
+        else:
+            # Take last frame's sprites off the screen
+            restored = [self._restore(rect) for rect in self.sprite_rects]
+            dirty = list(restored)
+            changed = []
+            for name, key, draw in queued_items:
+                old = self.items.get(name)
+                if old is None or old[0] != key:
+                    if old is not None:
+                        dirty.append(self._restore(old[1]))
+                    changed.append((name, key, draw))
+                elif restored and old[1].collidelist(restored) != -1:
+                    # Unchanged but partly wiped by a restored sprite: wipe all of it, blending text twice
+                    # over itself would darken its edges
+                    dirty.append(self._restore(old[1]))
+                    changed.append((name, key, draw))
+
+        for name, key, draw in changed:
+            rect = draw()
+            self.items[name] = (key, rect, draw)
+            dirty.append(rect.clip(self.bounds))
+
+        self.sprite_rects = []
+        for draw in queued_sprites:
+            rects = draw()
+            if rects is None:
+                continue
+            for rect in rects if isinstance(rects, list) else [rects]:
+                self.sprite_rects.append(rect)
+                dirty.append(rect.clip(self.bounds))
+
+        self.full = False
+        return [rect for rect in dirty if rect.width and rect.height]
@@ -0,0 +1,88 @@
+import numpy as np
+
+# Define actions
+A_ATTACK = 0
+A_DEFEND = 1
+A_BUILD_GOLD = 2
+A_SPECIAL_POWER = 3
+
+ACTIONS = [A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER]
+SPECIAL_POWER_COST = 50  # Gold needed (and spent) for the special power
+
+# What one turn changes: (player1_health, player2_health, player1_gold, player2_gold, player2_reward).
+# Player 2's special power has two entries: (with >= 50 gold, without). Player 1's special power
+# without enough gold does nothing at all and gives player 2 no reward.
+STANDARD_RULES = {
+    (A_ATTACK, A_ATTACK): (-10, -10, 0, 0, 5),
+    (A_ATTACK, A_DEFEND): (0, -5, 0, 0, 20),
+    (A_ATTACK, A_BUILD_GOLD): (0, -10, 0, 10, 10),
+    (A_ATTACK, A_SPECIAL_POWER): ((-20, -10, 0, -50, 25), (0, -10, 0, 0, 5)),
+
+    (A_DEFEND, A_ATTACK): (-5, 0, 0, 0, 5),
+    (A_DEFEND, A_DEFEND): (0, 0, 0, 0, 5),
+    (A_DEFEND, A_BUILD_GOLD): (0, 0, 0, 10, 5),
+    (A_DEFEND, A_SPECIAL_POWER): ((-15, 0, 0, -50, 25), (0, 0, 0, 0, 5)),
+
+    (A_BUILD_GOLD, A_ATTACK): (-10, 0, 10, 0, 15),
+    (A_BUILD_GOLD, A_DEFEND): (0, 0, 10, 0, 5),
+    (A_BUILD_GOLD, A_BUILD_GOLD): (0, 0, 10, 10, 10),
+    (A_BUILD_GOLD, A_SPECIAL_POWER): ((-20, 0, 10, -50, 25), (0, 0, 10, 0, 5)),
+
+    (A_SPECIAL_POWER, A_ATTACK): (-10, -20, -50, 0, 5),
+    (A_SPECIAL_POWER, A_DEFEND): (0, -15, -50, 0, 5),
+    (A_SPECIAL_POWER, A_BUILD_GOLD): (0, -20, -50, 10, 5),
+    (A_SPECIAL_POWER, A_SPECIAL_POWER): ((-20, -20, -50, -50, 25), (0, -20, -50, 0, 5)),
+}
+
+# Where each script's rules differ from the standard ones (battle_APS.py)
+RULE_VARIANTS = {
+    "battle_APS": {},
+    "battle_UCB": {
+        (A_ATTACK, A_DEFEND): (-5, 0, 0, 0, 20),
+        (A_ATTACK, A_BUILD_GOLD): (0, 0, 0, 10, 10),
+    },
+    "battle_APS_human": {
+        (A_ATTACK, A_BUILD_GOLD): (0, 0, 0, 10, 10),
+        (A_DEFEND, A_ATTACK): (0, 0, 0, 0, 5),
+        (A_DEFEND, A_DEFEND): (-5, 0, 0, 0, 5),
+    },
+    "temp": {
+        (A_DEFEND, A_DEFEND): (0, 0, 0, 0, 2),
+        (A_DEFEND, A_BUILD_GOLD): (0, 0, 0, 10, 10),
+    },
+}
+
+# The rules compiled into one int table indexed by
+# (p1 action, p2 action, p1 can use special, p2 can use special, field), fields as above
+class BattleRules:
+    HEALTH1, HEALTH2, GOLD1, GOLD2, REWARD = range(5)
+
+    def __init__(self, variant="battle_APS"):
+        rules = dict(STANDARD_RULES)
+        rules.update(RULE_VARIANTS[variant])
+        self.variant = variant
+        self.table = np.zeros((4, 4, 2, 2, 5), dtype=np.int64)
+        for (a1, a2), outcome in rules.items():
+            if a2 == A_SPECIAL_POWER:
+                with_gold, without_gold = outcome
+                self.table[a1, a2, :, 1] = with_gold
+                self.table[a1, a2, :, 0] = without_gold
+            else:
+                self.table[a1, a2] = outcome
+        self.table[A_SPECIAL_POWER, :, 0] = 0  # Player 1 cannot afford it: nothing happens
+        self._outcomes = self.table.tolist()  # Plain ints for the scalar path
+
+    def outcome(self, player1_action, player2_action, player1_gold, player2_gold):
+        # (player1_health, player2_health, player1_gold, player2_gold, player2_reward) changes for one turn
+        return self._outcomes[player1_action][player2_action][int(player1_gold >= SPECIAL_POWER_COST)][
+            int(player2_gold >= SPECIAL_POWER_COST)]
+
+    def outcomes(self, player1_actions, player2_actions, player1_gold, player2_gold):
+        # Batched lookup, returns an (n, 5) array of changes
+        return self.table[player1_actions, player2_actions,
+                          (np.asarray(player1_gold) >= SPECIAL_POWER_COST).astype(np.intp),
+                          (np.asarray(player2_gold) >= SPECIAL_POWER_COST).astype(np.intp)]
+
+    def player1_rewards(self, player1_actions, player2_actions, player1_gold, player2_gold):
+        # The rules only reward player 2; player 1 gets what player 2 would get in its seat
+        return self.outcomes(player2_actions, player1_actions, player2_gold, player1_gold)[..., self.REWARD]
@@ -0,0 +1,92 @@
+import os
+import sys
+import pygame
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.timing import span
+
+# Scene scheduler for the battle scripts: start screen, intro, battle and results are scenes, and
+# one persistent clock drives them all. Game logic runs in update() at a fixed timestep (step_ms of
+# real time per call, whatever the frame rate), drawing happens once per frame after it. A scene that
+# says it is idle (nothing moves until the player does something) is not redrawn every frame: the
+# scheduler sleeps in pygame.event.wait() and only wakes up for events or every idle_wake_ms, so a
+# waiting start or results screen costs next to no CPU.
+#
+# Callbacks return the name of the next scene to switch to, DONE to end run(), or None to stay.
+# Each phase of a frame is a span of common.timing (GAME_TIMING=1 to see where the frame time goes).
+
+DONE = "done"
+
+class Scene:
+    def __init__(self, update=None, draw=None, handle_event=None, enter=None, idle=None):
+        self.update = update or (lambda: None)
+        self.draw = draw or (lambda: None)
+        self.handle_event = handle_event or (lambda event: None)
+        self.enter = enter or (lambda: None)
+        self.idle = idle or (lambda: False)
+
+class SceneScheduler:
+    def __init__(self, fps=60, step_ms=1000 / 60, idle_wake_ms=250, max_frame_ms=250):
+        self.fps = fps
+        self.step_ms = step_ms
+        self.idle_wake_ms = idle_wake_ms
+        self.max_frame_ms = max_frame_ms  # Longer frames are not caught up, so updates never pile up
+        self.clock = pygame.time.Clock()
+        self.scenes = {}
+
+    def add(self, name, scene):
+        self.scenes[name] = scene
+
+    def _events(self, idle):
+        if not idle:
+            with span("events"):
+                return pygame.event.get()
+        with span("idle_wait"):
+            event = pygame.event.wait(self.idle_wake_ms)
+            events = [event] if event.type != pygame.NOEVENT else []
+            return events + pygame.event.get()
+
+    def run(self, name):
+        scene = self.scenes[name]
+        scene.enter()
+        redraw = True
+        self.clock.tick()
+        accumulator = 0.0
+        while True:
+            idle = scene.idle() and not redraw
+            events = self._events(idle)
+            with span("tick"):
+                accumulator += min(self.clock.tick(0 if idle else self.fps), self.max_frame_ms)
+
+            next_name = None
+            for event in events:
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+                next_name = scene.handle_event(event) or next_name
+                redraw = True
+            while next_name is None and accumulator >= self.step_ms:
+                accumulator -= self.step_ms
+                with span("update"):
+                    next_name = scene.update()
+
+            if next_name == DONE:
+                return
+            if next_name is not None:
+                scene = self.scenes[next_name]
+                scene.enter()
+                accumulator = 0.0
+                redraw = True
+                continue
+
+            if redraw or not scene.idle():
+                # draw() may return the changed areas of the screen, otherwise the whole display is flipped
+                with span("draw"):
+                    rects = scene.draw()
+                with span("display"):
+                    if rects is None:
+                        pygame.display.flip()
+                    elif rects:
+                        pygame.display.update(rects)
+                redraw = False
@@ -0,0 +1,93 @@
+import argparse
+import functools
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.parallel import run_episodes
+from battle_engine import simulate_battles
+from battle_minimax import solve
+from battle_rules import BattleRules, RULE_VARIANTS
+
+# Round-robin tournament: every ordered pair of policies plays many battles (first policy as player 1),
+# with the battles of each match spread over worker processes by common.parallel. Every block runs
+# through the batched engine and writes one row of FIELDS per battle into shared memory.
+
+DEFAULT_POLICIES = ["aps:0.02", "aps:0.08", "aps:0.3", "ucb", "random", "scripted", "minimax"]
+FIELDS = ["winner", "turns", "player1_regret", "player2_regret"]
+
+def _battle_block(rng, n_battles, n_fields, player1, player2, variant, max_turns):
+    results = simulate_battles(n_battles, player2, rules=BattleRules(variant), seed=rng, max_turns=max_turns,
+                               player1=player1)
+    return np.stack([getattr(results, field) for field in FIELDS], axis=1)
+
+def play_match(player1, player2, n_battles=1000, variant="battle_APS", seed=None, workers=None, block_size=None,
+               max_turns=5000):
+    # Returns one row of FIELDS per battle
+    block = functools.partial(_battle_block, player1=player1, player2=player2, variant=variant, max_turns=max_turns)
+    return run_episodes(block, n_battles, len(FIELDS), seed, workers, block_size, dtype=np.float64)
+
+def run_tournament(policies=DEFAULT_POLICIES, n_battles=1000, variant="battle_APS", seed=None, workers=None,
+                   block_size=None, max_turns=5000):
+    # Tables are (player 1 policy x player 2 policy)
+    n = len(policies)
+    # Solve the minimax tables once up front, forked workers inherit them from solve's cache
+    for policy in policies:
+        name, _, param = policy.partition(":")
+        if name == "minimax":
+            solve(variant, param or "win")
+    tables = {name: np.zeros((n, n)) for name in
+              ["player1_wins", "player2_wins", "draws", "unfinished", "mean_turns", "player1_regret",
+               "player2_regret"]}
+    for i, player1 in enumerate(policies):
+        for j, player2 in enumerate(policies):
+            match_seed = None if seed is None else [seed, i, j]
+            rows = play_match(player1, player2, n_battles, variant, match_seed, workers, block_size, max_turns)
+            winner, turns, player1_regret, player2_regret = rows.T
+            tables["player1_wins"][i, j] = np.mean(winner == 1)
+            tables["player2_wins"][i, j] = np.mean(winner == 2)
+            tables["draws"][i, j] = np.mean(winner == 0)
+            tables["unfinished"][i, j] = np.mean(winner == -1)  # Still running after max_turns
+            tables["mean_turns"][i, j] = turns.mean()
+            tables["player1_regret"][i, j] = player1_regret.mean()
+            tables["player2_regret"][i, j] = player2_regret.mean()
+    return tables
+
+def format_table(title, policies, table, fmt="{:.3f}"):
+    width = max(10, max(len(p) for p in policies) + 2)
+    lines = [title, "p1 \\ p2".ljust(width) + "".join(p.rjust(width) for p in policies)]
+    for policy, row in zip(policies, table):
+        lines.append(policy.ljust(width) + "".join(fmt.format(v).rjust(width) for v in row))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Battle tournament between player policies")
+    parser.add_argument("--policies", nargs="+", default=DEFAULT_POLICIES,
+                        help="aps, aps:<eta>, ucb, random, scripted, minimax or minimax:reward")
+    parser.add_argument("--battles", type=int, default=1000, help="Battles per match")
+    parser.add_argument("--rules", choices=sorted(RULE_VARIANTS), default="battle_APS")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Defaults to all cores")
+    parser.add_argument("--max-turns", type=int, default=5000,
+                        help="Battles still running after this many turns count as unfinished")
+    args = parser.parse_args()
+
+    tables = run_tournament(args.policies, args.battles, args.rules, args.seed, args.workers,
+                            max_turns=args.max_turns)
+    print(format_table("Player 1 win rate", args.policies, tables["player1_wins"]))
+    print()
+    print(format_table("Player 2 win rate", args.policies, tables["player2_wins"]))
+    print()
+    print(format_table("Draw rate", args.policies, tables["draws"]))
+    print()
+    print(format_table(f"Unfinished rate (still running after {args.max_turns} turns)", args.policies,
+                       tables["unfinished"]))
+    print()
+    print(format_table("Mean battle length (turns)", args.policies, tables["mean_turns"], "{:.1f}"))
+    print()
+    print(format_table("Player 1 mean regret (nan: random and scripted player 1 aren't tracked)", args.policies,
+                       tables["player1_regret"], "{:.1f}"))
+    print()
+    print(format_table("Player 2 mean regret", args.policies, tables["player2_regret"], "{:.1f}"))
@@ -1,11 +1,25 @@
 import pygame
 import sys
+import functools
+import os
 import math
-import numpy as np
 import random
-import matplotlib.pyplot as plt
 
-# Initialize Pygame
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.stats import RegretStats
+from common.timing import span
+from common.decision_log import open_from_env
+from battle_regret import RegretTable
+from battle_rules import A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER, BattleRules
+from battle_bandits import BernoulliAPSBandit
+from battle_scenes import Scene, SceneScheduler, DONE
+from battle_audio import AudioManager, pre_init_mixer
+from battle_assets import AssetManager
+from battle_render import Compositor, TextCache
+
+# Initialize Pygame, with a small mixer buffer for low sound latency
+pre_init_mixer()
 pygame.init()
 
 # Set up the screen
@@ -14,33 +28,27 @@ screen_height = 600
 screen = pygame.display.set_mode((screen_width, screen_height))
 pygame.display.set_caption("Dragon Ball Z")
 
+# Load images in the display's pixel format, with the decoded and scaled pixels cached on disk
+# (see battle_assets.py)
+assets = AssetManager()
+
 # Load start screen background image
-start_background_img = pygame.image.load("start_bg.jpg")
-start_background_img = pygame.transform.scale(start_background_img, (screen_width, screen_height))
+start_background_img = assets.image("start_bg.jpg", (screen_width, screen_height))
 
 # Load background image
-background_img = pygame.image.load("bg.jpeg")
-background_img = pygame.transform.scale(background_img, (screen_width, screen_height))
-
-# Load character images and scale them down
-character1_img = pygame.image.load("naruto.png")
-character1_img = pygame.transform.scale(character1_img, (240, 280))
-
-character2_img = pygame.image.load("goku.png")
-character2_img = pygame.transform.scale(character2_img, (160, 240))
-
-# Load button images and scale them down
-attack_btn_img = pygame.image.load("laser.png")
-attack_btn_img = pygame.transform.scale(attack_btn_img, (50, 50))
-
-defend_btn_img = pygame.image.load("shield.png")
-defend_btn_img = pygame.transform.scale(defend_btn_img, (50, 50))
-
-gold_btn_img = pygame.image.load("gold.png")
-gold_btn_img = pygame.transform.scale(gold_btn_img, (50, 50))
-
-special_btn_img = pygame.image.load("special.png")
-special_btn_img = pygame.transform.scale(special_btn_img, (50, 50))
+background_img = assets.image("bg.jpeg", (screen_width, screen_height))
+
+# Load character, button and start button images scaled down, packed into one atlas
+(character1_img, character2_img, attack_btn_img, defend_btn_img, gold_btn_img, special_btn_img,
+ start_button_img) = assets.sprites([
+    ("naruto.png", (240, 280)),
+    ("goku.png", (160, 240)),
+    ("laser.png", (50, 50)),
+    ("shield.png", (50, 50)),
+    ("gold.png", (50, 50)),
+    ("special.png", (50, 50)),
+    ("start_btn.png", (300, 200)),
+])
 
 # Set initial positions for characters
 char1_x = 100
@@ -49,9 +57,10 @@ char1_y = screen_height // 2 - character1_img.get_height() // 2
 char2_x = screen_width - 100 - character2_img.get_width()
 char2_y = screen_height // 2 - character2_img.get_height() // 2
 
-# Load sound effects
-bg_music = pygame.mixer.Sound("background_music.mp3")
-start_music = pygame.mixer.Sound("start_music.mp3")
+# Music is streamed from disk while it plays (see battle_audio.py)
+audio = AudioManager()
+bg_music = "background_music.mp3"
+start_music = "start_music.mp3"
 
 # Player attributes
 player1_health = 500
@@ -70,56 +79,21 @@ black = (0, 0, 0)
 # Font
 font = pygame.font.Font(None, 24)
 
-# Define actions
-A_ATTACK = 0
-A_DEFEND = 1
-A_BUILD_GOLD = 2
-A_SPECIAL_POWER = 3
-
-#APS
-class BernoulliAPSBandit:
-    def __init__(self, n_arms, eta=0.08):        
-        self.n_arms = n_arms
-        self.eta = eta
-        self.exploration_weights = np.ones(n_arms)  # Initialize exploration weights uniformly
-        
-    def pull_arm(self):        
-        normalized_weights = self.exploration_weights / np.sum(self.exploration_weights)
-        cum_prob = np.cumsum(normalized_weights)
-        rand_num = np.random.rand()
-        location_index = next(i for i in range(len(cum_prob)) if cum_prob[i] > rand_num)
-        return location_index
-    
-    def update(self, chosen_location, reward):  
-        k = self.n_arms
-        w_t = self.exploration_weights[chosen_location]  # Weight before update
-        
-        # Ensuring w_t is never exactly 1 to avoid division by zero
-        w_t = np.clip(w_t, None, 0.9999)
-
-        if reward == 1:
-            self.exploration_weights[chosen_location] = (1 - np.exp(-self.eta)) / (1 - np.exp(-self.eta / w_t))
-        else:
-            self.exploration_weights[chosen_location] = (np.exp(self.eta) - 1) / (np.exp(self.eta / w_t) - 1)
-        
-        # Adjust other weights
-        for i in range(k):
-            if i != chosen_location:
-                # Protect against division by zero or undefined operations
-                try:
-                    adjustment = ((1 - self.exploration_weights[chosen_location]) / max(1 - w_t, 0.0001))
-                    self.exploration_weights[i] = np.clip(self.exploration_weights[i] * adjustment, 0.001, None)
-                except RuntimeWarning as e:
-                    print(f"Warning: {e}")
+# Game rules, compiled into lookup tables (see battle_rules.py)
+rules = BattleRules("temp")
+regret_table = RegretTable("temp")  # Player 2 regret per turn, see battle_regret.py
 
 # Create bandit for player 2
 player2_bandit = BernoulliAPSBandit(4)
 
-# Lists to store regrets
-regret_player2 = []
+# Streaming regret statistics per turn
+regret_player2 = RegretStats()
 cumulative_regret = 0
+turn = 0
+# Decision records of every step, only written when GAME_LOG is set (see common/decision_log.py)
+decision_log = open_from_env("temp")
 
-# Function to draw buttons
+# Function to draw buttons (queued with the compositor, redrawn only when the highlight changes)
 def draw_buttons(selected_action, player):
     button_size = 50
     button_padding = 20
@@ -136,294 +110,200 @@ def draw_buttons(selected_action, player):
     # Draw buttons for player 1
     if player == 1:
         for i, (x, y) in enumerate(button_positions):
-            pygame.draw.circle(screen, black, (x + button_radius, y + button_radius), button_radius + 3, 2)  # Border
-            if selected_action == i:
-                pygame.draw.circle(screen, yellow, (x + button_radius, y + button_radius), button_radius)  # Highlight
-            screen.blit(button_images[i], (x, y))
-
-# Function to animate players entering the screen
-def animate_players_entering():
-    frames = 30
-    for i in range(frames):
-        ratio = i / frames
-        char1_current_x = int(ratio * (100 + character1_img.get_width()))  # Move from -width to 100
-        char2_current_x = int(screen_width - ratio * (100 + character2_img.get_width()))  # Move from width to screen_width - 100
-        screen.blit(start_background_img, (0, 0))  # Draw start screen background
-        screen.blit(character1_img, (char1_current_x, char1_y))  # Draw character 1 entering from left
-        screen.blit(character2_img, (char2_current_x, char2_y))  # Draw character 2 entering from right
-        pygame.display.flip()
-        pygame.time.delay(20)
+            compositor.item(("button", i), selected_action == i,
+                            functools.partial(draw_button, button_images[i], x, y, button_radius, selected_action == i))
+
+def draw_button(image, x, y, button_radius, selected):
+    pygame.draw.circle(screen, black, (x + button_radius, y + button_radius), button_radius + 3, 2)  # Border
+    if selected:
+        pygame.draw.circle(screen, yellow, (x + button_radius, y + button_radius), button_radius)  # Highlight
+    screen.blit(image, (x, y))
+    return pygame.Rect(x - 3, y - 3, 2 * button_radius + 6, 2 * button_radius + 6)
+
+# The game runs as scenes driven by one clock (see battle_scenes.py)
+scheduler = SceneScheduler()
+INTRO_FRAME_MS = 20  # Each frame of the intro shows for 20 ms
+intro_frames = 30
+intro_time = 0
+results_time = 0
+player1_action = None
+
+# Function to draw the players entering the screen, at the current intro frame
+def draw_players_entering():
+    ratio = min(int(intro_time // INTRO_FRAME_MS), intro_frames - 1) / intro_frames
+    char1_current_x = int(ratio * (100 + character1_img.get_width()))  # Move from -width to 100
+    char2_current_x = int(screen_width - ratio * (100 + character2_img.get_width()))  # Move from width to screen_width - 100
+    screen.blit(start_background_img, (0, 0))  # Draw start screen background
+    screen.blit(character1_img, (char1_current_x, char1_y))  # Draw character 1 entering from left
+    screen.blit(character2_img, (char2_current_x, char2_y))  # Draw character 2 entering from right
+
+def intro_update():
+    global intro_time
+    intro_time += scheduler.step_ms
+    if intro_time >= intro_frames * INTRO_FRAME_MS:
+        return "battle"
+
+# Function to start the background music, once (it loops by itself)
+def start_screen_enter():
+    audio.play_music(bg_music, loops=-1)
 
 # Function to handle events on the start screen
-def handle_start_screen_events():
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            # Check if the mouse click is within the bounds of the start button
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            button_rect = start_button_img.get_rect(topleft=(350, 400))
-            if button_rect.collidepoint(mouse_x, mouse_y):
-                return True  # Start button clicked
-    return False
-
-def calculate_optimal_payoff(player1_action, player2_action, player1_health, player2_health):    
-    if(player2_action == A_ATTACK):
-        if(player1_action == A_ATTACK):
-            return 5        
-        elif(player1_action == A_DEFEND):
-            return 5        
-        elif(player1_action == A_BUILD_GOLD):
-            return 15        
-        elif(player1_action == A_SPECIAL_POWER):
-            if(player1_gold>=50):
-                return 5    
-            else:
-                return 10                                          
-    elif(player2_action == A_DEFEND):
-        if(player1_action == A_ATTACK):
-            return 20      
-        elif(player1_action == A_DEFEND):
-            return 5        
-        elif(player1_action == A_BUILD_GOLD):
-            return 5        
-        elif(player1_action == A_SPECIAL_POWER):
-            if(player1_gold>=50):
-                return 5   
-            else:
-                return 10         
-    elif(player2_action == A_BUILD_GOLD):
-        if(player1_action == A_ATTACK):
-            return 10      
-        elif(player1_action == A_DEFEND):
-            return 5        
-        elif(player1_action == A_BUILD_GOLD):
-            return 10     
-        elif(player1_action == A_SPECIAL_POWER):
-            if(player1_gold>=50):
-                return 5
-            else:
-                return 10
-    elif(player2_action == A_SPECIAL_POWER and player2_gold >= 50):
-        if(player1_action == A_ATTACK):
-            return 25       
-        elif(player1_action == A_DEFEND):
-            return 25        
-        elif(player1_action == A_BUILD_GOLD):
-            return 25        
-        elif(player1_action == A_SPECIAL_POWER):
-            if(player1_gold>=50):
-                return 25
-            else:
-                return 15
-    else:
-        return 0            
-            
-
-def calculate_regret(player1_action, player2_action, player1_health, player2_health):
-    # Calculate the payoff for player 1's action against each possible action of player 2
-    player1_payoffs = []
-    for action in [A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER]:
-        player1_payoff = calculate_optimal_payoff(player1_action, action, player1_health, player2_health)
-        player1_payoffs.append(player1_payoff)
-
-    # Calculate the maximum possible payoff for player 1 given player 2's action
-    max_player1_payoff = max(player1_payoffs)
-
-    # Calculate the payoff for player 2's actual action against player 1's actual action
-    actual_player1_payoff = calculate_optimal_payoff(player1_action, player2_action, player1_health, player2_health)
-
-    # Calculate the regret
-    regret = actual_player1_payoff - max_player1_payoff
-    return regret
-
-# Function to play start music
-def play_start_music():
-    bg_music.stop()
-    start_music.play()
-        
-# Load start button image and scale it down
-start_button_img = pygame.image.load("start_btn.png")
-start_button_img = pygame.transform.scale(start_button_img, (300, 200))
-
-# Main loop for start screen
-while True:
-    bg_music.play()
-    if handle_start_screen_events():
-        play_start_music()  # Start button clicked
-        break  # Break out of the loop when the start button is clicked
-    
+def start_screen_event(event):
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        # Check if the mouse click is within the bounds of the start button
+        mouse_x, mouse_y = pygame.mouse.get_pos()
+        button_rect = start_button_img.get_rect(topleft=(350, 400))
+        if button_rect.collidepoint(mouse_x, mouse_y):
+            play_start_music()  # Start button clicked
+            return "intro"
+
+def draw_start_screen():
     # Draw start screen background
     screen.blit(start_background_img, (0, 0))
-    
+
     # Draw start button
     screen.blit(start_button_img, (250, 400))
-    
-    # Update display
-    pygame.display.flip()
-
-# Animate players entering the screen
-animate_players_entering()
-
-# Main game loop
-while True:
-    # Handle events
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()        
-
-    # Clear the screen
-    screen.fill((255, 255, 255))  # Fill screen with white color
-
-    # Draw background
-    screen.blit(background_img, (0, 0))
 
-    # Draw characters on top of background
-    screen.blit(character1_img, (char1_x, char1_y))
-    screen.blit(character2_img, (char2_x, char2_y))
-
-    # Draw health and gold bars for player 1
+# Function to play start music
+def play_start_music():
+    audio.play_music(start_music)  # Replaces the background music
+
+# Background with the characters on it, composed once; the HUD is drawn on top and only the parts
+# that changed are sent to the display (see battle_render.py)
+battle_layer = background_img.copy()
+battle_layer.blit(character1_img, (char1_x, char1_y))
+battle_layer.blit(character2_img, (char2_x, char2_y))
+compositor = Compositor(screen, battle_layer)
+text_cache = TextCache(font)
+
+# Function to draw HUD text right-aligned at the right edge of the screen
+def blit_text_right(text, y):
+    text_img = text_cache.render(text, black)
+    return screen.blit(text_img, (screen_width - text_img.get_width() - 10, y))
+
+# Function to queue the battle HUD with the compositor
+def queue_battle():
+    # Health and gold bars for player 1
     player1_health_width = min(player1_health * (400 / 500), 400)  # Scale health to fit within 400 pixels
-    pygame.draw.rect(screen, green, (10, 10, player1_health_width, 20))
-    pygame.draw.rect(screen, yellow, (10, 40, min(player1_gold * 2, 400), 20))  # Cap at 400 pixels width
+    player1_gold_width = min(player1_gold * 2, 400)  # Cap at 400 pixels width
+    compositor.item("player1_health_bar", player1_health_width,
+                    lambda: pygame.draw.rect(screen, green, (10, 10, player1_health_width, 20)))
+    compositor.item("player1_gold_bar", player1_gold_width,
+                    lambda: pygame.draw.rect(screen, yellow, (10, 40, player1_gold_width, 20)))
 
-    # Draw health and gold bars for player 2
+    # Health and gold bars for player 2
     player2_health_width = min(player2_health * (400 / 500), 400)  # Scale health to fit within 400 pixels
-    pygame.draw.rect(screen, green, (screen_width - player2_health_width - 10, 10, player2_health_width, 20))
-    pygame.draw.rect(screen, yellow, (screen_width - min(player2_gold * 2, 400) - 10, 40, min(player2_gold * 2, 400), 20))  # Cap at 400 pixels width
-
-    # Render text
-    player1_health_text = font.render("Health: " + str(player1_health), True, black)
-    player1_gold_text = font.render("Gold: " + str(player1_gold), True, black)
-    player2_health_text = font.render("Health: " + str(player2_health), True, black)
-    player2_gold_text = font.render("Gold: " + str(player2_gold), True, black)
-
-    # Draw text on screen
-    screen.blit(player1_health_text, (10, 70))
-    screen.blit(player1_gold_text, (10, 100))
-    screen.blit(player2_health_text, (screen_width - player2_health_text.get_width() - 10, 70))
-    screen.blit(player2_gold_text, (screen_width - player2_gold_text.get_width() - 10, 100))
-
-    # Player 1's action selection (random)    
-    while(1):
-        player1_action = random.choice([A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER])
-        if(player1_action == A_SPECIAL_POWER and player1_gold < 50):
-            pass
-        else:
-            break
-    
-    # Draw buttons for player 1
+    player2_gold_width = min(player2_gold * 2, 400)  # Cap at 400 pixels width
+    compositor.item("player2_health_bar", player2_health_width,
+                    lambda: pygame.draw.rect(screen, green, (screen_width - player2_health_width - 10, 10, player2_health_width, 20)))
+    compositor.item("player2_gold_bar", player2_gold_width,
+                    lambda: pygame.draw.rect(screen, yellow, (screen_width - player2_gold_width - 10, 40, player2_gold_width, 20)))
+
+    # Text, rendered once per distinct value
+    player1_health_text = "Health: " + str(player1_health)
+    player1_gold_text = "Gold: " + str(player1_gold)
+    player2_health_text = "Health: " + str(player2_health)
+    player2_gold_text = "Gold: " + str(player2_gold)
+    compositor.item("player1_health_text", player1_health_text,
+                    lambda: screen.blit(text_cache.render(player1_health_text, black), (10, 70)))
+    compositor.item("player1_gold_text", player1_gold_text,
+                    lambda: screen.blit(text_cache.render(player1_gold_text, black), (10, 100)))
+    compositor.item("player2_health_text", player2_health_text, lambda: blit_text_right(player2_health_text, 70))
+    compositor.item("player2_gold_text", player2_gold_text, lambda: blit_text_right(player2_gold_text, 100))
+
+    # Buttons for player 1
     draw_buttons(player1_action, player=1)
 
+def draw_battle():
+    queue_battle()
+    return compositor.flush()
+
+# One turn of the battle per simulation step
+def battle_update():
+    global player1_health, player1_gold, player2_health, player2_gold, player1_action, cumulative_regret, turn
+
+    # Player 1's action selection (random)
+    with span("update:player1"):
+        while(1):
+            player1_action = random.choice([A_ATTACK, A_DEFEND, A_BUILD_GOLD, A_SPECIAL_POWER])
+            if(player1_action == A_SPECIAL_POWER and player1_gold < 50):
+                pass
+            else:
+                break
+
     # Player 2's action selection (UCB)
-    player2_action = player2_bandit.pull_arm()
+    with span("update:pull_arm"):
+        player2_action = player2_bandit.pull_arm()
 
     # Execute actions
-    if player1_action == A_ATTACK:
-        if player2_action == A_ATTACK:
-            player1_health -= 10
-            player2_health -= 10
-            player2_reward = 5
-        elif player2_action == A_DEFEND:            
-            player2_health -= 5
-            player2_reward = 20
-        elif player2_action == A_BUILD_GOLD:
-            player2_health -= 10
-            player2_gold += 10
-            player2_reward = 10
-        elif player2_action == A_SPECIAL_POWER:
-            if player2_gold >= 50:
-                player1_health -= 20
-                player2_health -= 10
-                player2_reward = 25
-                player2_gold -= 50
-            else:                
-                player2_health -= 10
-                player2_reward = 5
-                
-    elif  player1_action == A_DEFEND:
-        if player2_action == A_ATTACK:
-            player1_health -= 5
-            player2_reward = 5
-        elif player2_action == A_DEFEND:
-            player2_health -= 0
-            player2_reward = 2
-        elif player2_action == A_BUILD_GOLD:
-            player2_gold += 10
-            player2_reward = 10
-        elif player2_action == A_SPECIAL_POWER:
-            if player2_gold >= 50:
-                player1_health -= 15
-                player2_reward = 25
-                player2_gold -= 50
-            else:                
-                player2_reward = 5                
-                
-    elif  player1_action == A_BUILD_GOLD:
-        player1_gold += 10
-        if player2_action == A_ATTACK:
-            player1_health -= 10    
-            player2_reward = 15                
-        elif player2_action == A_DEFEND:
-            player2_health -= 0
-            player2_reward = 5
-        elif player2_action == A_BUILD_GOLD:
-            player2_gold += 10
-            player2_reward = 10
-        elif player2_action == A_SPECIAL_POWER:
-            if player2_gold >= 50:
-                player1_health -= 20
-                player2_reward = 25
-                player2_gold -= 50
-            else:                
-                player2_reward = 5                
-                
-    elif  player1_action == A_SPECIAL_POWER and player1_gold >= 50: 
-        player1_gold -= 50               
-        if player2_action == A_ATTACK:
-            player1_health -= 10    
-            player2_health -= 20  
-            player2_reward = 5                              
-        elif player2_action == A_DEFEND:            
-            player2_health -= 15
-            player2_reward = 5
-        elif player2_action == A_BUILD_GOLD:
-            player2_gold += 10
-            player2_health -= 20
-            player2_reward = 5
-        elif player2_action == A_SPECIAL_POWER:
-            if player2_gold >= 50:
-                player1_health -= 20
-                player2_health -= 20
-                player2_reward = 25
-                player2_gold -= 50
-            else:                
-                player2_reward = 5
-                player2_health -= 20
-    else:
-        player2_reward = 0        
-    
-    regret = calculate_regret(player1_action, player2_action, player1_health, player2_health)
-    cumulative_regret += regret 
-    regret_player2.append(cumulative_regret)
+    with span("update:rules"):
+        health1_change, health2_change, gold1_change, gold2_change, player2_reward = rules.outcome(
+            player1_action, player2_action, player1_gold, player2_gold)
+        player1_health += health1_change
+        player2_health += health2_change
+        player1_gold += gold1_change
+        player2_gold += gold2_change
+
+    with span("update:regret"):
+        regret = regret_table.regret(player1_action, player2_action, player1_health, player1_gold, player2_gold)
+        cumulative_regret += regret
+        regret_player2.update(turn, cumulative_regret)
 
     # Update bandit for player 2 with reward
-    player2_bandit.update(player2_action, player2_reward)
+    with span("update:bandit_update"):
+        player2_bandit.update(player2_action, player2_reward)
+
+    # Decision log (GAME_LOG=<directory>), with the bandit's state every few turns
+    with span("update:log"):
+        decision_log.record(turn, player2_action, player2_reward, regret, player1_action=player1_action,
+                            player1_health=player1_health, player2_health=player2_health,
+                            player1_gold=player1_gold, player2_gold=player2_gold)
+        decision_log.snapshot(turn, player2_bandit)
+    turn += 1
 
     # Check if game should end
     if player1_health <= 0 or player2_health <= 0:
-        break
-
-    # Update the display
-    pygame.display.flip()
-
-    # Cap the frame rate
-    pygame.time.Clock().tick(60)
+        return "results"
+
+# Results screen: the final state and the winner, until a click or key, or a few seconds have passed
+RESULTS_MS = 3000
+results_font = pygame.font.Font(None, 72)
+
+def results_update():
+    global results_time
+    results_time += scheduler.step_ms
+    if results_time >= RESULTS_MS:
+        return DONE
+
+def results_event(event):
+    if event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN):
+        return DONE
+
+def draw_results():
+    queue_battle()
+    if player1_health <= 0 and player2_health <= 0:
+        message = "Draw!"
+    elif player2_health <= 0:
+        message = "Player 1 wins!"
+    else:
+        message = "Player 2 wins!"
+    text = results_font.render(message, True, red)
+    compositor.item("results", message, lambda: screen.blit(
+        text, (screen_width // 2 - text.get_width() // 2, screen_height // 2 - text.get_height() // 2)))
+    return compositor.flush()
+
+scheduler.add("start", Scene(enter=start_screen_enter, draw=draw_start_screen, handle_event=start_screen_event,
+                             idle=lambda: True))
+scheduler.add("intro", Scene(update=intro_update, draw=draw_players_entering))
+scheduler.add("battle", Scene(enter=compositor.invalidate, update=battle_update, draw=draw_battle))
+scheduler.add("results", Scene(update=results_update, draw=draw_results, handle_event=results_event,
+                               idle=lambda: True))
+scheduler.run("start")
+decision_log.close()
 
 # Plot regret for player 2
-plt.plot(regret_player2, label='Player 2 Regret')
+import matplotlib.pyplot as plt  # Only needed for the plot, so imported this late
+plt.plot(regret_player2.steps, regret_player2.mean, label='Player 2 Regret')
 plt.xlabel('Time')
 plt.ylabel('Regret')
 # plt.ylim(0,2000)
@@ -0,0 +1,227 @@
+import heapq
+import math
+import numpy as np
+
+class BernoulliAPSBandit:
+    def __init__(self, n_arms, eta=0.05):        
+        self.n_arms = n_arms
+        self.eta = eta
+        self.exploration_weights = np.ones(n_arms)  # Initialize exploration weights uniformly
+        
+    def pull_arm(self):        
+        normalized_weights = self.exploration_weights / np.sum(self.exploration_weights)
+        cum_prob = np.cumsum(normalized_weights)
+        rand_num = np.random.rand()
+        location_index = next(i for i in range(len(cum_prob)) if cum_prob[i] > rand_num)
+        return location_index
+    
+    def update_exploration_weights(self, chosen_location, reward):  # Ensure arguments are in the correct order
+        k = self.n_arms
+        w_t = self.exploration_weights[chosen_location]  # Weight before update
+        
+        # Ensure w_t is never exactly 1 to avoid division by zero
+        w_t = np.clip(w_t, None, 0.9999)
+
+        if reward == 1:
+            self.exploration_weights[chosen_location] = (1 - np.exp(-self.eta)) / (1 - np.exp(-self.eta / w_t))
+        else:
+            self.exploration_weights[chosen_location] = (np.exp(self.eta) - 1) / (np.exp(self.eta / w_t) - 1)
+        
+        # Adjust other weights
+        for i in range(k):
+            if i != chosen_location:
+                # Protect against division by zero or undefined operations
+                try:
+                    adjustment = ((1 - self.exploration_weights[chosen_location]) / max(1 - w_t, 0.0001))
+                    self.exploration_weights[i] = np.clip(self.exploration_weights[i] * adjustment, 0.001, None)
+                except RuntimeWarning as e:
+                    print(f"Warning: {e}")
+
+def _aps_chosen_weight(w_t, reward, eta):
+    # Scalar form of the APS update for the pulled arm; huge exponents go to the same limits numpy's inf gives
+    ratio = eta / w_t if w_t > 0 else math.inf
+    if reward == 1:
+        return (1 - math.exp(-eta)) / (1 - math.exp(-ratio))
+    if ratio > 700:
+        return 0.0
+    return (math.exp(eta) - 1) / (math.exp(ratio) - 1)
+
+# Same policy as BernoulliAPSBandit with O(log k) pull_arm and update for large numbers of arms.
+# Each weight is stored as raw * scale: raw values live in a Fenwick tree, and "multiply every other
+# arm by the adjustment" becomes a single update of scale. Arms pushed down to the 0.001 floor at the
+# same time all share one weight, so they are kept in a pool with a single raw value instead of being
+# clipped one by one; a second Fenwick tree counts pool arms so sampling still walks the arms in index
+# order, like the cumulative sum in BernoulliAPSBandit. A min-heap of raw values finds the free arms
+# that cross the floor.
+#
+# The tree sums are updated incrementally, so they carry rounding error proportional to the largest raw
+# value they have held. Keeping scale within 1/scale_band..scale_band (folding it back into the raw
+# values, rebuilding the weight tree and recomputing its total with math.fsum whenever it leaves) keeps
+# that error negligible against the total weight.
+class SumTreeAPSBandit:
+    floor = 0.001
+    scale_band = 1e8
+
+    def __init__(self, n_arms, eta=0.05):
+        self.n_arms = n_arms
+        self.eta = eta
+        self.scale = 1.0
+        self.raw = [1.0] * n_arms
+        self.pool = set()  # Arms sitting at the floor, all weighing pool_raw * scale (their raw is 0)
+        self.pool_raw = 0.0
+        self.pool_tree = [0] * (n_arms + 1)  # Fenwick tree of pool membership, exact integer counts
+        self.heap = [(1.0, arm) for arm in range(n_arms)]
+        self.tree = None
+        self.touched = set()  # Arms set since the last rebuild
+        self._rebuild()
+
+    def _rebuild(self):
+        # Fold the scale back into the raw values, rebuild the weight tree and its total exactly and drop
+        # stale heap entries (every free arm has at least one entry, the newest holding its raw value)
+        free = {arm for _, arm in self.heap if arm not in self.pool}
+        touched = free | self.touched
+        if self.tree is not None and len(touched) * self.n_arms.bit_length() < self.n_arms:
+            # Pool arms have raw 0, so only nodes above a free arm or an arm set since the last rebuild
+            # can hold anything: clear those and add the free arms back in
+            for arm in touched:
+                i = arm + 1
+                while i <= self.n_arms:
+                    self.tree[i] = 0.0
+                    i += i & -i
+            for arm in free:
+                value = self.raw[arm] = self.raw[arm] * self.scale
+                i = arm + 1
+                while i <= self.n_arms:
+                    self.tree[i] += value
+                    i += i & -i
+        else:
+            raw = np.array(self.raw) * self.scale
+            self.raw = raw.tolist()
+            # Fenwick build one level at a time: nodes whose lowest set bit is step are complete once the
+            # lower levels have been added in
+            tree = np.concatenate([[0.0], raw])
+            step = 1
+            while step <= self.n_arms:
+                nodes = np.arange(step, self.n_arms + 1 - step, 2 * step)
+                tree[nodes + step] += tree[nodes]
+                step *= 2
+            self.tree = tree.tolist()
+        self.pool_raw *= self.scale
+        self.scale = 1.0
+        self.tree_total = math.fsum(self.raw[arm] for arm in free)
+        self.heap = [(self.raw[arm], arm) for arm in free]
+        heapq.heapify(self.heap)
+        self.touched.clear()
+
+    @property
+    def exploration_weights(self):
+        weights = np.array(self.raw) * self.scale
+        weights[list(self.pool)] = self.pool_raw * self.scale
+        return weights
+
+    def _set(self, arm, value):
+        delta = value - self.raw[arm]
+        self.raw[arm] = value
+        self.touched.add(arm)
+        self.tree_total += delta
+        tree, n_arms = self.tree, self.n_arms
+        i = arm + 1
+        while i <= n_arms:
+            tree[i] += delta
+            i += i & -i
+        if arm not in self.pool:
+            heapq.heappush(self.heap, (value, arm))
+
+    def _count_pool(self, arm, delta):
+        pool_tree, n_arms = self.pool_tree, self.n_arms
+        i = arm + 1
+        while i <= n_arms:
+            pool_tree[i] += delta
+            i += i & -i
+
+    def _find(self, target):
+        # Smallest arm whose prefix sum of raw weights (pool arms weighing pool_raw) exceeds target
+        tree, pool_tree, pool_raw, n_arms = self.tree, self.pool_tree, self.pool_raw, self.n_arms
+        pos = 0
+        mask = 1 << (n_arms.bit_length() - 1)
+        while mask:
+            nxt = pos + mask
+            if nxt <= n_arms:
+                weight = tree[nxt] + pool_tree[nxt] * pool_raw
+                if weight <= target:
+                    pos = nxt
+                    target -= weight
+            mask >>= 1
+        return min(pos, n_arms - 1)
+
+    def _pool_add(self, arm, floor_raw):
+        if not self.pool:
+            self.pool_raw = floor_raw
+        self._set(arm, 0.0)
+        self.pool.add(arm)
+        self._count_pool(arm, 1)
+
+    def _pool_remove(self, arm):
+        self.pool.remove(arm)
+        self._count_pool(arm, -1)
+
+    def pull_arm(self):
+        # The common scale cancels out, so sampling works directly on raw values
+        target = np.random.rand() * (self.tree_total + len(self.pool) * self.pool_raw)
+        return self._find(target)
+
+    def update_exploration_weights(self, chosen_location, reward):
+        if chosen_location in self.pool:
+            w_t = self.pool_raw * self.scale
+            self._pool_remove(chosen_location)
+        else:
+            w_t = self.raw[chosen_location] * self.scale
+        w_t = min(w_t, 0.9999)  # Never exactly 1, as in BernoulliAPSBandit
+
+        chosen = _aps_chosen_weight(w_t, reward, self.eta)
+        self.scale *= (1 - chosen) / max(1 - w_t, 0.0001)  # Adjust all other weights at once
+        self._set(chosen_location, chosen / self.scale)
+        self._apply_floor(chosen_location)
+
+        if not 1 / self.scale_band < self.scale < self.scale_band or len(self.heap) > 2 * self.n_arms + 64:
+            self._rebuild()
+
+    def _apply_floor(self, chosen_location):
+        floor_raw = self.floor / self.scale
+        at_floor = not self.pool
+        if self.pool and self.pool_raw < floor_raw:
+            self.pool_raw = floor_raw
+            at_floor = True
+
+        skipped = None
+        while self.heap and self.heap[0][0] < floor_raw:
+            raw, arm = heapq.heappop(self.heap)
+            if arm in self.pool or raw != self.raw[arm]:
+                continue  # Stale entry
+            if arm == chosen_location:
+                skipped = (raw, arm)  # The pulled arm itself is never clipped
+            elif at_floor:
+                self._pool_add(arm, floor_raw)
+            else:
+                # Pool sits above the floor, so this arm gets its own floor weight
+                self._set(arm, floor_raw)
+        if skipped:
+            heapq.heappush(self.heap, skipped)
+
+class BernoulliUCBBandit:
+    def __init__(self, k):
+        self.k = k
+        self.q = np.zeros(k)  # Estimated probabilities of success
+        self.n = np.zeros(k)  # Times each arm has been pulled
+        self.total_pulls = 0
+
+    def pull_arm(self):
+        if self.total_pulls < self.k:  # Explore each arm once before using UCB
+            return self.total_pulls
+        ucb_values = self.q + np.sqrt(2 * np.log(self.total_pulls) / (self.n + 1e-10))  # UCB1 formula
+        return np.argmax(ucb_values)
+
+    def update(self, arm, reward):
+        self.n[arm] += 1
+        self.q[arm] += (reward - self.q[arm]) / self.n[arm]
+        self.total_pulls += 1
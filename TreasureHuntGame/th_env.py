@@ -0,0 +1,171 @@
+import numpy as np
+
+# Game settings
+num_quadrants = 4
+box_size = 40
+treasure_probabilities = [0.4, 0.5, 0.6, 0.7]  # Probability of finding treasure in each quadrant
+max_treasures_per_quad = 100  # Maximum number of treasures that can appear in a quadrant
+cells_per_quad = 100  # 10 x 10 boxes in every quadrant
+
+# Initialize treasures with unique positions
+def initialize_treasures(rng=np.random):
+    treasures = []
+    for quad in range(num_quadrants):
+        # Calculate the expected number of treasures in this quadrant based on its probability
+        expected_treasures = int(round(max_treasures_per_quad * treasure_probabilities[quad]))
+
+        # Distinct boxes drawn in one call, no retries on duplicates
+        cells = sample_treasure_cells(expected_treasures, cells_per_quad, rng)
+        xs = (quad % 2) * 400 + (cells % 10) * box_size
+        ys = (quad // 2) * 400 + (cells // 10) * box_size
+        treasures.extend((int(x), int(y), quad) for x, y in zip(xs, ys))
+    return treasures
+
+def sample_treasure_cells(count, cells_per_region, rng=np.random):
+    # count distinct cell indices of one region, sampled without replacement
+    return rng.choice(cells_per_region, size=count, replace=False)
+
+def random_occupancy(n_maps, counts, cells_per_region, rng):
+    # Fresh (map, region, cell) occupancy for n_maps maps at once, with exactly counts[region]
+    # treasures per region: one vectorized call per region keeps the counts[region] cells with the
+    # smallest random keys, which is a uniform sample without replacement for every map
+    counts = np.asarray(counts)
+    occupancy = np.zeros((n_maps, len(counts), cells_per_region), dtype=bool)
+    for region, count in enumerate(counts):
+        if count >= cells_per_region:
+            occupancy[:, region] = True
+        elif count > 0:
+            keys = rng.random((n_maps, cells_per_region))
+            threshold = np.partition(keys, count - 1, axis=1)[:, count - 1:count]
+            occupancy[:, region] = keys <= threshold
+    return occupancy
+
+# Indexed view of the treasures: a boolean (quadrant, row, col) occupancy grid so a hit
+# test is a single array lookup instead of a scan over the treasure list
+class TreasureMap:
+    def __init__(self, treasures):
+        self.treasures = list(treasures)  # Kept for drawing
+        self.grid = np.zeros((num_quadrants, 10, 10), dtype=bool)
+        for x, y, quad in self.treasures:
+            self.grid[quad, (y % 400) // box_size, (x % 400) // box_size] = True
+
+    def __iter__(self):
+        return iter(self.treasures)
+
+    def __len__(self):
+        return len(self.treasures)
+
+    def hit(self, x, y):
+        quad = (y // 400) * 2 + x // 400
+        return bool(self.grid[quad, (y % 400) // box_size, (x % 400) // box_size])
+
+    def hits(self, xs, ys):
+        # Batched hit test for arrays of pixel coordinates
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        quads = (ys // 400) * 2 + xs // 400
+        return self.grid[quads, (ys % 400) // box_size, (xs % 400) // box_size]
+
+    def cells(self):
+        # (quadrant, cell) view with cell = row * 10 + col, as used by the headless engine
+        return self.grid.reshape(num_quadrants, -1)
+
+    # Region interface shared with BitsetTreasureMap (a region is a quadrant here)
+    n_regions = num_quadrants
+    cells_per_region = cells_per_quad
+
+    @property
+    def counts(self):
+        return self.cells().sum(axis=1)
+
+    def region_hits(self, regions, cells):
+        return self.cells()[regions, cells]
+
+# Configurable large map stored as a packed bitset, one bit per cell. The map is a
+# regions_x x regions_y grid of square regions (the quadrants of the big map) with region_side
+# cells per side; cell = row * region_side + col inside its region. Each region's bits are padded
+# to whole bytes so regions can be generated and written independently, and the bits can live in
+# an np.memmap on disk. Treasure counts per region are precomputed and stored with the map.
+class BitsetTreasureMap:
+    def __init__(self, bits, counts, regions_x, regions_y, region_side, path=None):
+        self.bits = bits  # uint8 (region, byte) array, possibly memory-mapped
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.regions_x = regions_x
+        self.regions_y = regions_y
+        self.region_side = region_side
+        self.n_regions = regions_x * regions_y
+        self.cells_per_region = region_side * region_side
+        self.path = path
+
+    @classmethod
+    def generate(cls, regions_x, regions_y, region_side, probabilities, seed=None, path=None):
+        # Every region gets exactly round(probability * cells) treasures, like the game's quadrants.
+        # With a path the bits are written straight into a memory-mapped file, one region at a time
+        rng = np.random.default_rng(seed)
+        n_regions = regions_x * regions_y
+        cells_per_region = region_side * region_side
+        probabilities = np.broadcast_to(np.asarray(probabilities, dtype=float), (n_regions,))
+        shape = (n_regions, -(-cells_per_region // 8))
+        if path is None:
+            bits = np.zeros(shape, dtype=np.uint8)
+        else:
+            bits = np.lib.format.open_memmap(path + ".bits.npy", mode="w+", dtype=np.uint8, shape=shape)
+        counts = np.empty(n_regions, dtype=np.int64)
+        cells = np.zeros(cells_per_region, dtype=bool)
+        for region in range(n_regions):
+            counts[region] = int(round(probabilities[region] * cells_per_region))
+            cells[:] = False
+            cells[sample_treasure_cells(counts[region], cells_per_region, rng)] = True
+            bits[region] = np.packbits(cells)
+        treasure_map = cls(bits, counts, regions_x, regions_y, region_side, path)
+        if path is not None:
+            treasure_map.save(path)
+        return treasure_map
+
+    def save(self, path):
+        # Writes <path>.bits.npy (memory-mappable) and <path>.meta.npz
+        if self.path != path:
+            np.save(path + ".bits.npy", np.asarray(self.bits))
+        elif isinstance(self.bits, np.memmap):
+            self.bits.flush()
+        np.savez(path + ".meta.npz", counts=self.counts,
+                 layout=np.array([self.regions_x, self.regions_y, self.region_side]))
+        self.path = path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with np.load(path + ".meta.npz") as meta:
+            counts = meta["counts"]
+            regions_x, regions_y, region_side = (int(v) for v in meta["layout"])
+        bits = np.load(path + ".bits.npy", mmap_mode="r" if mmap else None)
+        return cls(bits, counts, regions_x, regions_y, region_side, path)
+
+    def __reduce__(self):
+        # Worker processes re-open a saved map instead of receiving a pickled copy of the bits
+        if self.path is not None:
+            return (BitsetTreasureMap.load, (self.path,))
+        return (BitsetTreasureMap, (np.asarray(self.bits), self.counts, self.regions_x, self.regions_y,
+                                    self.region_side))
+
+    @property
+    def probabilities(self):
+        return self.counts / self.cells_per_region
+
+    def region_hit(self, region, cell):
+        return bool((self.bits[region, cell >> 3] >> (7 - (cell & 7))) & 1)
+
+    def region_hits(self, regions, cells):
+        # Batched hit test for arrays of (region, cell) pairs
+        cells = np.asarray(cells)
+        return ((self.bits[regions, cells >> 3] >> (7 - (cells & 7))) & 1).astype(bool)
+
+    def hits(self, xs, ys):
+        # Batched hit test for arrays of whole-map cell coordinates
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        side = self.region_side
+        regions = (ys // side) * self.regions_x + xs // side
+        return self.region_hits(regions, (ys % side) * side + xs % side)
+
+    def hit(self, x, y):
+        return bool(self.hits(x, y))
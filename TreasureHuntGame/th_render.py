@@ -0,0 +1,55 @@
+import time
+import pygame
+
+from th_env import box_size
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+BLUE = (0, 0, 255)
+GREEN = (0, 255, 0)
+
+# Treasures and the grid never change after initialize_treasures(), so they are drawn once
+# into an off-screen surface that every frame just blits before drawing the agent on top
+def build_static_layer(treasures, screen_size):
+    layer = pygame.Surface((screen_size, screen_size)).convert()
+    layer.fill(WHITE)
+
+    # Draw treasures
+    for treasure in treasures:
+        pygame.draw.rect(layer, GREEN, (treasure[0], treasure[1], box_size, box_size))
+
+    # Draw quadrants
+    for i in range(0, screen_size, box_size):
+        pygame.draw.line(layer, BLUE if i % 400 != 0 else BLACK, (i, 0), (i, screen_size), 2)
+        pygame.draw.line(layer, BLUE if i % 400 != 0 else BLACK, (0, i), (screen_size, i), 2)
+    return layer
+
+# Decides which simulation steps get drawn. The default (every step, no fps target) is the classic
+# visual run throttled to 30 steps/s; render_every > 1 or an fps target turns on turbo mode, where the
+# simulation runs uncapped and only some steps are drawn. The last step is always drawn.
+class RenderGate:
+    def __init__(self, n_steps, render_every=1, fps=None):
+        self.last_step = n_steps - 1
+        self.render_every = max(1, render_every)
+        self.interval = 1.0 / fps if fps else None
+        self.next_time = 0.0
+        self.throttled = self.render_every == 1 and self.interval is None
+
+    def due(self, step):
+        if step == self.last_step:
+            return True
+        if step % self.render_every != 0:
+            return False
+        if self.interval is not None:
+            now = time.perf_counter()
+            if now < self.next_time:
+                return False
+            self.next_time = now + self.interval
+        return True
+
+def add_render_args(parser):
+    parser.add_argument("--render-every", type=int, default=1, metavar="N",
+                        help="Only draw every Nth step and run the simulation uncapped")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="Draw at most this many frames per second and run the simulation uncapped")
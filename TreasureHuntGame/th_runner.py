@@ -0,0 +1,77 @@
+import argparse
+import functools
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.parallel import map_blocks, run_episodes, worker_count
+from common.stats import RegretStats
+from th_env import initialize_treasures, TreasureMap, BitsetTreasureMap
+from th_sim import simulate, RegretCurves
+
+# Multi-seed Treasure Hunt experiments spread over all cores. Each worker runs its blocks with the
+# vectorized engine from th_sim. Normally every block sends back only its RegretStats and final
+# regrets, which the parent merges; with keep_runs the blocks write the full per-step cumulative
+# regret into shared memory instead. With a single worker there is nothing to spread, so all runs go
+# through one simulate() call (one Python loop over the steps instead of one per block); its random
+# streams differ from the blocked layout's, which is the same for any number of workers above one.
+
+def _stats_block(rng, n_runs, n_steps, policy, eta, treasures, regenerate_maps):
+    curves = simulate(policy, n_runs, n_steps, seed=rng, eta=eta, treasures=treasures,
+                      regenerate_maps=regenerate_maps)
+    return curves.stats, curves.final
+
+def _regret_block(rng, n_runs, n_steps, policy, eta, treasures, regenerate_maps):
+    return simulate(policy, n_runs, n_steps, seed=rng, eta=eta, treasures=treasures, keep_runs=True,
+                    regenerate_maps=regenerate_maps).runs
+
+def _summarize(runs):
+    stats = RegretStats()
+    for step in range(runs.shape[1]):
+        stats.update(step, runs[:, step])
+    return RegretCurves(stats.mean, stats.std, runs[:, -1].astype(np.float64), None, stats)
+
+def run_parallel(policy="aps", n_runs=10000, n_steps=3000, seed=None, eta=0.05, treasures=None,
+                 workers=None, block_size=None, keep_runs=False, regenerate_maps=False):
+    # One child of the seed places the default map, the other seeds the blocks of episodes
+    map_seed, episode_seed = np.random.SeedSequence(seed).spawn(2)
+    if treasures is None:
+        treasures = initialize_treasures(np.random.default_rng(map_seed))
+    if isinstance(treasures, list):
+        treasures = TreasureMap(treasures)
+    if worker_count(workers) <= 1:
+        return simulate(policy, n_runs, n_steps, seed=np.random.default_rng(episode_seed), eta=eta,
+                        treasures=treasures, keep_runs=keep_runs, regenerate_maps=regenerate_maps)
+    if keep_runs:
+        block = functools.partial(_regret_block, policy=policy, eta=eta, treasures=treasures,
+                                  regenerate_maps=regenerate_maps)
+        runs = run_episodes(block, n_runs, n_steps, episode_seed, workers, block_size)
+        return _summarize(runs)._replace(runs=runs)
+
+    block = functools.partial(_stats_block, n_steps=n_steps, policy=policy, eta=eta, treasures=treasures,
+                              regenerate_maps=regenerate_maps)
+    blocks = map_blocks(block, n_runs, episode_seed, workers, block_size)
+    stats = blocks[0][0]
+    for block_stats, _ in blocks[1:]:
+        stats.merge(block_stats)
+    final = np.concatenate([block_final for _, block_final in blocks])
+    return RegretCurves(stats.mean, stats.std, final, None, stats)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel multi-seed Treasure Hunt regret study")
+    parser.add_argument("--policy", choices=["aps", "ucb"], default="aps")
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--steps", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--eta", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=None, help="Defaults to all cores")
+    parser.add_argument("--map", default=None, help="Path prefix of a saved BitsetTreasureMap")
+    parser.add_argument("--regenerate-maps", action="store_true", help="Place fresh treasures for every run")
+    args = parser.parse_args()
+
+    treasures = BitsetTreasureMap.load(args.map) if args.map else None
+    curves = run_parallel(args.policy, args.runs, args.steps, args.seed, args.eta, treasures, workers=args.workers,
+                          regenerate_maps=args.regenerate_maps)
+    print(f"{args.policy}: {curves.stats.summary()}")
@@ -0,0 +1,85 @@
+import os
+import sys
+import numpy as np
+from collections import namedtuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.bandits import BatchedAPSBandit, BatchedUCBBandit
+from common.stats import RegretStats
+from th_env import initialize_treasures, random_occupancy, TreasureMap
+
+# Headless Monte Carlo engine: runs many Treasure Hunt episodes at once, one row per run,
+# driving the batched versions of BernoulliAPSBandit / BernoulliUCBBandit from common/bandits.py.
+# eta may be one value per run to sweep the APS learning rate in a single call. Any map with the
+# region interface works: the game's TreasureMap (4 quadrants) or a large BitsetTreasureMap.
+# log (a common.decision_log.DecisionLog) gets one row per run and step plus bandit snapshots.
+
+# mean/std are per time bucket across runs, final holds each run's last cumulative regret,
+# runs is the full (runs x steps) cumulative regret matrix when keep_runs=True (else None) and
+# stats is the streaming RegretStats accumulator the curves came from (quantiles, merging)
+RegretCurves = namedtuple("RegretCurves", ["mean", "std", "final", "runs", "stats"])
+
+def simulate(policy="aps", n_runs=1000, n_steps=3000, seed=None, eta=0.05, treasures=None, keep_runs=False,
+             bucket_size=1, regenerate_maps=False, log=None):
+    # regenerate_maps gives every run its own freshly placed map with the same per-region counts
+    if policy not in ("aps", "ucb"):
+        raise ValueError(f"Unknown policy: {policy}")
+    rng = np.random.default_rng(seed)
+    if treasures is None:
+        treasures = initialize_treasures(rng)  # The map is part of the seeded run too
+    if isinstance(treasures, list):
+        treasures = TreasureMap(treasures)
+    n_arms = treasures.n_regions
+    cells_per_region = treasures.cells_per_region
+
+    # Regret of every arm, same definition as the game loop (best probability minus chosen one)
+    probabilities = treasures.counts / cells_per_region
+    arm_regret = probabilities.max() - probabilities
+    if regenerate_maps:
+        occupancy = random_occupancy(n_runs, treasures.counts, cells_per_region, rng)
+        rows = np.arange(n_runs)
+
+    if policy == "aps":
+        bandit = BatchedAPSBandit(n_runs, n_arms, eta, rng)
+    else:
+        bandit = BatchedUCBBandit(n_runs, n_arms)
+
+    cumulative = np.zeros(n_runs)
+    stats = RegretStats(bucket_size)
+    runs = np.empty((n_runs, n_steps), dtype=np.float32) if keep_runs else None
+
+    for step in range(n_steps):
+        arms = bandit.pull_arm()
+        # The agent digs a uniformly random box inside the chosen quadrant
+        cells = rng.integers(0, cells_per_region, n_runs)
+        if regenerate_maps:
+            rewards = occupancy[rows, arms, cells]
+        else:
+            rewards = treasures.region_hits(arms, cells)
+        bandit.update(arms, rewards)
+
+        cumulative += arm_regret[arms]
+        stats.update(step, cumulative)
+        if log is not None:
+            log.record_batch(step, arms, rewards, arm_regret[arms])
+            log.snapshot(step, bandit)
+        if keep_runs:
+            runs[:, step] = cumulative
+
+    return RegretCurves(stats.mean, stats.std, cumulative, runs, stats)
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    for policy in ("aps", "ucb"):
+        curves = simulate(policy, n_runs=10000, seed=0)
+        print(f"{policy}: {curves.stats.summary()}")
+        low, high = curves.stats.quantile([0.05, 0.95])
+        plt.plot(curves.stats.steps, curves.mean, label=f'{policy.upper()} mean')
+        plt.fill_between(curves.stats.steps, low, high, alpha=0.2)
+    plt.xlabel('Time step')
+    plt.ylabel('Cumulative Regret')
+    plt.ylim(0,200)
+    plt.legend()
+    plt.show()
@@ -0,0 +1,71 @@
+import numpy as np
+
+# Array-backed versions of the games' BernoulliAPSBandit / BernoulliUCBBandit: state is (runs x arms),
+# and every call advances all R independent learners at once. Used by both the Treasure Hunt engine
+# (th_sim) and the battle engine (battle_engine). eta may be a scalar or one value per learner for
+# sweeps; each game passes its own default. keep_rows drops learners whose episode has ended.
+class BatchedAPSBandit:
+    def __init__(self, n_runs, n_arms, eta, rng=None):
+        self.n_runs = n_runs
+        self.n_arms = n_arms
+        self.eta = np.broadcast_to(np.asarray(eta, dtype=float), (n_runs,))
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.exploration_weights = np.ones((n_runs, n_arms))  # Initialize exploration weights uniformly
+        self._rows = np.arange(n_runs)
+
+    def pull_arm(self):
+        normalized_weights = self.exploration_weights / self.exploration_weights.sum(axis=1, keepdims=True)
+        cum_prob = np.cumsum(normalized_weights, axis=1)
+        rand_num = self.rng.random(self.n_runs)[:, None]
+        # First index with cum_prob > rand_num (clamped against round-off in the last bucket)
+        return np.minimum((cum_prob <= rand_num).sum(axis=1), self.n_arms - 1)
+
+    def update(self, chosen_locations, rewards):
+        weights = self.exploration_weights
+        rows = self._rows
+        w_t = np.minimum(weights[rows, chosen_locations], 0.9999)  # Weight before update, never exactly 1
+        eta = self.eta
+        with np.errstate(over='ignore', divide='ignore'):
+            chosen = np.where(np.asarray(rewards) == 1,
+                              (1 - np.exp(-eta)) / (1 - np.exp(-eta / w_t)),
+                              (np.exp(eta) - 1) / (np.exp(eta / w_t) - 1))
+        adjustment = (1 - chosen) / np.maximum(1 - w_t, 0.0001)
+        np.maximum(weights * adjustment[:, None], 0.001, out=weights)
+        weights[rows, chosen_locations] = chosen
+
+    update_exploration_weights = update
+
+    def keep_rows(self, rows):
+        # Drop finished learners (rows is a bool mask or index array over the current rows)
+        self.exploration_weights = self.exploration_weights[rows]
+        self.eta = self.eta[rows]
+        self.n_runs = len(self.exploration_weights)
+        self._rows = np.arange(self.n_runs)
+
+class BatchedUCBBandit:
+    def __init__(self, n_runs, k):
+        self.n_runs = n_runs
+        self.k = k
+        self.q = np.zeros((n_runs, k))  # Estimated probabilities of success
+        self.n = np.zeros((n_runs, k))  # Times each arm has been pulled
+        self.total_pulls = np.zeros(n_runs, dtype=int)
+        self._rows = np.arange(n_runs)
+
+    def pull_arm(self):
+        log_pulls = np.log(np.maximum(self.total_pulls, 1))[:, None]  # Rows still exploring are masked below
+        ucb_values = self.q + np.sqrt(2 * log_pulls / (self.n + 1e-10))  # UCB1 formula
+        # Explore each arm once before using UCB
+        return np.where(self.total_pulls < self.k, self.total_pulls, np.argmax(ucb_values, axis=1))
+
+    def update(self, arms, rewards):
+        rows = self._rows
+        self.n[rows, arms] += 1
+        self.q[rows, arms] += (rewards - self.q[rows, arms]) / self.n[rows, arms]
+        self.total_pulls += 1
+
+    def keep_rows(self, rows):
+        self.q = self.q[rows]
+        self.n = self.n[rows]
+        self.total_pulls = self.total_pulls[rows]
+        self.n_runs = len(self.q)
+        self._rows = np.arange(self.n_runs)
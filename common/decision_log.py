@@ -0,0 +1,171 @@
+import atexit
+import glob
+import json
+import os
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional: decisions are written as NPZ chunks without it
+    pyarrow = None
+
+# Columnar log of every decision a game loop makes, for offline analysis of long runs. Rows
+# (step, arm, reward, regret plus any extra columns) are buffered in memory and written out every
+# chunk_rows rows as one file per chunk: decisions-00000.parquet when pyarrow is installed, else
+# decisions-00000.npz. Every snapshot_every steps the policy's state (APS exploration_weights,
+# UCB q / n / total_pulls) goes to snapshots-00000.npz alongside, a file whenever the buffered
+# snapshots hold chunk_rows values. read_log() puts a directory back together as arrays.
+#
+# The game scripts log when GAME_LOG=<directory> is set (see open_from_env); otherwise they get a
+# NullLog whose methods do nothing. close() (or leaving a with-block) writes out what is buffered.
+
+ENV_VAR = "GAME_LOG"
+POLICY_STATE = ("exploration_weights", "q", "n", "total_pulls")
+
+class DecisionLog:
+    def __init__(self, directory, chunk_rows=65536, snapshot_every=100, format="auto", meta=None):
+        if format == "auto":
+            format = "parquet" if pyarrow is not None else "npz"
+        if format == "parquet" and pyarrow is None:
+            raise ImportError("Writing Parquet needs pyarrow")
+        if format not in ("npz", "parquet"):
+            raise ValueError(f"Unknown log format: {format}")
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.snapshot_every = snapshot_every
+        self.format = format
+        self.columns = None
+        self._buffers = None
+        self._rows = 0
+        self._snapshots = []
+        self._snapshot_values = 0  # Array elements buffered in _snapshots
+        self._chunk = 0
+        self._snapshot_chunk = 0
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(dict(meta or {}, chunk_rows=chunk_rows, snapshot_every=snapshot_every, format=format), f)
+
+    def _append(self, row, n_rows):
+        if self.columns is None:
+            self.columns = list(row)
+            self._buffers = {name: [] for name in self.columns}
+        elif len(row) != len(self.columns) or any(name not in self._buffers for name in row):
+            raise ValueError(f"Log columns are {self.columns}, got {list(row)}")
+        for name, value in row.items():
+            self._buffers[name].append(value)
+        self._rows += n_rows
+        if self._rows >= self.chunk_rows:
+            self.flush()
+
+    def record(self, step, arm, reward, regret, **extra):
+        # One decision of a game loop; extra keyword columns must be the same on every call
+        self._append(dict(step=step, arm=arm, reward=reward, regret=regret, **extra), 1)
+
+    def record_batch(self, step, arms, rewards, regrets, **extra):
+        # One step of many runs at once (the vectorized engines): one row per run, with a run column
+        arms = np.asarray(arms)
+        n_runs = len(arms)
+        self._append(dict(step=np.full(n_runs, step, dtype=np.int64), run=np.arange(n_runs), arm=arms,
+                          reward=np.asarray(rewards), regret=np.asarray(regrets),
+                          **{name: np.asarray(value) for name, value in extra.items()}), n_runs)
+
+    def due(self, step):
+        return self.snapshot_every > 0 and step % self.snapshot_every == 0
+
+    def snapshot(self, step, bandit):
+        # Copies the policy's state if a snapshot is due at this step
+        if not self.due(step):
+            return
+        state = {name: np.array(getattr(bandit, name)) for name in POLICY_STATE if hasattr(bandit, name)}
+        self._snapshots.append((step, state))
+        # Counted by size like the decision rows, one snapshot of 10k batched runs is already large
+        self._snapshot_values += sum(value.size for value in state.values())
+        if self._snapshot_values >= self.chunk_rows:
+            self._flush_snapshots()
+
+    def flush(self):
+        if self._rows:
+            columns = {}
+            for name, values in self._buffers.items():
+                columns[name] = np.concatenate(values) if isinstance(values[0], np.ndarray) else np.asarray(values)
+                values.clear()
+            path = os.path.join(self.directory, f"decisions-{self._chunk:05d}.{self.format}")
+            if self.format == "parquet":
+                pyarrow.parquet.write_table(pyarrow.table(columns), path)
+            else:
+                np.savez(path, **columns)
+            self._chunk += 1
+            self._rows = 0
+        self._flush_snapshots()
+
+    def _flush_snapshots(self):
+        if not self._snapshots:
+            return
+        arrays = {"step": np.array([step for step, _ in self._snapshots])}
+        for name in self._snapshots[0][1]:
+            arrays[name] = np.stack([state[name] for _, state in self._snapshots])
+        np.savez(os.path.join(self.directory, f"snapshots-{self._snapshot_chunk:05d}.npz"), **arrays)
+        self._snapshot_chunk += 1
+        self._snapshots = []
+        self._snapshot_values = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class NullLog:
+    def record(self, *args, **kwargs):
+        pass
+
+    def record_batch(self, *args, **kwargs):
+        pass
+
+    def due(self, step):
+        return False
+
+    def snapshot(self, step, bandit):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+def open_from_env(name, **kwargs):
+    # DecisionLog in $GAME_LOG/<name> when GAME_LOG is set, else a NullLog
+    directory = os.environ.get(ENV_VAR)
+    if not directory:
+        return NullLog()
+    log = DecisionLog(os.path.join(directory, name), **kwargs)
+    atexit.register(log.close)  # Also written out when the window is closed mid-game
+    return log
+
+def _load_chunk(path):
+    if path.endswith(".parquet"):
+        if pyarrow is None:
+            raise ImportError("Reading Parquet needs pyarrow")
+        table = pyarrow.parquet.read_table(path)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def read_log(directory):
+    # (decisions, snapshots): dicts of column name -> array, chunks concatenated in order
+    def concat(paths):
+        chunks = [_load_chunk(path) for path in paths]
+        if not chunks:
+            return {}
+        return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+    decisions = concat(sorted(glob.glob(os.path.join(directory, "decisions-*.npz")) +
+                              glob.glob(os.path.join(directory, "decisions-*.parquet"))))
+    snapshots = concat(sorted(glob.glob(os.path.join(directory, "snapshots-*.npz"))))
+    return decisions, snapshots
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+# Fans blocks of episodes out over a process pool. Every block gets its own np.random.Generator
+# spawned from one master SeedSequence, so results depend only on (seed, block_size) and never on
+# the number of workers. The default block size depends on the number of episodes alone: big enough
+# that each block amortizes the engines' per-step Python overhead, small enough to give up to
+# MAX_BLOCKS blocks, one per core on large machines. Workers write their rows straight into one shared-memory array
+# (episodes x steps) instead of pickling results back to the parent.
+#
+# episode_fn(rng, n_episodes, n_steps) must be a picklable (module level or functools.partial)
+# function returning an (n_episodes, n_steps) array for its block. seed is anything SeedSequence takes,
+# or a SeedSequence itself (e.g. a child spawned for this purpose).
+#
+# When only a summary of every block is needed (e.g. a RegretStats accumulator), map_blocks skips the
+# shared array: block_fn(rng, n_episodes) returns any small picklable value and the parent gets the
+# values back in block order, with the same per-block seeds as run_episodes.
+
+MIN_BLOCK_SIZE = 256
+MAX_BLOCKS = 64
+
+_shared = None  # (SharedMemory, ndarray view) of the current worker
+
+def default_block_size(n_episodes):
+    return max(MIN_BLOCK_SIZE, -(-n_episodes // MAX_BLOCKS))
+
+def worker_count(workers=None):
+    # Worker processes to use when workers is None: all cores
+    return workers or os.cpu_count() or 1
+
+def _attach(name, shape, dtype):
+    global _shared
+    shm = SharedMemory(name=name)
+    _shared = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+def _run_block(task):
+    episode_fn, start, stop, seed_seq, n_steps = task
+    _shared[1][start:stop] = episode_fn(np.random.default_rng(seed_seq), stop - start, n_steps)
+    return stop - start
+
+def _block_seeds(n_episodes, seed, block_size):
+    # [(start, stop, SeedSequence)] for every block
+    if block_size is None:
+        block_size = default_block_size(n_episodes)
+    n_blocks = -(-n_episodes // block_size)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [(b * block_size, min((b + 1) * block_size, n_episodes), block_seed)
+            for b, block_seed in enumerate(seed.spawn(n_blocks))]
+
+def _map_block(task):
+    block_fn, start, stop, seed_seq = task
+    return block_fn(np.random.default_rng(seed_seq), stop - start)
+
+def map_blocks(block_fn, n_episodes, seed=None, workers=None, block_size=None):
+    # [block_fn(rng, episodes in block) for every block], in block order
+    tasks = [(block_fn, start, stop, block_seed) for start, stop, block_seed in _block_seeds(n_episodes, seed, block_size)]
+    workers = min(worker_count(workers), len(tasks))
+    if workers <= 1:
+        return [_map_block(task) for task in tasks]
+    with Pool(workers) as pool:
+        return pool.map(_map_block, tasks)
+
+def run_episodes(episode_fn, n_episodes, n_steps, seed=None, workers=None, block_size=None,
+                 dtype=np.float32, reduce_fn=None):
+    # Returns reduce_fn(results) when given (computed before the shared block is released),
+    # otherwise a private copy of the (episodes x steps) results
+    dtype = np.dtype(dtype)
+    shape = (n_episodes, n_steps)
+    tasks = [(episode_fn, start, stop, block_seed, n_steps)
+             for start, stop, block_seed in _block_seeds(n_episodes, seed, block_size)]
+    workers = min(worker_count(workers), len(tasks))
+
+    shm = SharedMemory(create=True, size=max(1, n_episodes * n_steps * dtype.itemsize))
+    try:
+        results = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if workers <= 1:
+            # Run in-process, same seeds and layout as the pool
+            _attach(shm.name, shape, dtype)
+            for task in tasks:
+                _run_block(task)
+        else:
+            with Pool(workers, initializer=_attach, initargs=(shm.name, shape, dtype)) as pool:
+                for _ in pool.imap_unordered(_run_block, tasks):
+                    pass
+        out = reduce_fn(results) if reduce_fn is not None else results.copy()
+        del results
+        return out
+    finally:
+        _release()
+        shm.close()
+        shm.unlink()
+
+def _release():
+    global _shared
+    if _shared is not None:
+        shm, view = _shared
+        _shared = None
+        del view
+        shm.close()
@@ -0,0 +1,155 @@
+import numpy as np
+
+# Streaming statistics of cumulative regret per time bucket. Every bucket keeps a Welford
+# (count, mean, M2) triple plus a reservoir sample of at most sketch_size values used as a quantile
+# sketch, so memory never grows with the number of runs or samples fed in. Buckets are allocated on
+# demand, so episodes of unknown length (battles) can stream in too, and the reservoirs are only as
+# wide as the fullest bucket needs: a single game run (one sample per step) costs a few floats per step.
+class RegretStats:
+    def __init__(self, bucket_size=1, sketch_size=256, seed=0):
+        self.bucket_size = bucket_size
+        self.sketch_size = sketch_size
+        self.rng = np.random.default_rng(seed)  # Own stream, never touches the simulation's
+        self.n_buckets = 0
+        self._count = np.zeros(0, dtype=np.int64)
+        self._mean = np.zeros(0)
+        self._m2 = np.zeros(0)
+        self._sketch = np.full((0, 0), np.nan)  # (buckets, reservoir width <= sketch_size)
+
+    def _grow(self, n_buckets):
+        capacity = len(self._count)
+        if n_buckets > capacity:
+            extra = max(n_buckets, 2 * capacity, 16) - capacity
+            self._count = np.concatenate([self._count, np.zeros(extra, dtype=np.int64)])
+            self._mean = np.concatenate([self._mean, np.zeros(extra)])
+            self._m2 = np.concatenate([self._m2, np.zeros(extra)])
+            self._sketch = np.concatenate([self._sketch, np.full((extra, self._sketch.shape[1]), np.nan)])
+        self.n_buckets = max(self.n_buckets, n_buckets)
+
+    def _widen(self, width):
+        # Make the reservoirs hold at least width samples (never more than sketch_size)
+        current = self._sketch.shape[1]
+        width = min(width, self.sketch_size)
+        if width > current:
+            width = min(max(width, 2 * current), self.sketch_size)
+            extra = np.full((len(self._sketch), width - current), np.nan)
+            self._sketch = np.concatenate([self._sketch, extra], axis=1)
+
+    def update(self, step, values):
+        # values: one cumulative regret, or one per run, observed at this time step
+        if isinstance(values, (int, float, np.integer, np.floating)):
+            self._update_one(step, float(values))
+            return
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values) == 0:
+            return
+        bucket = step // self.bucket_size
+        self._grow(bucket + 1)
+
+        # Chan et al. parallel form of Welford's update, merging the whole batch at once
+        seen = self._count[bucket]
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+        total = seen + len(values)
+        delta = batch_mean - self._mean[bucket]
+        self._mean[bucket] += delta * len(values) / total
+        self._m2[bucket] += batch_m2 + delta ** 2 * seen * len(values) / total
+        self._count[bucket] = total
+
+        self._sample(bucket, seen, values)
+
+    def _update_one(self, step, value):
+        # Same as update() with a single value, in plain Python: the game loops call this every step
+        bucket = step // self.bucket_size
+        if bucket >= self.n_buckets:
+            self._grow(bucket + 1)
+        seen = int(self._count[bucket])
+        total = seen + 1
+        delta = value - self._mean[bucket]
+        self._mean[bucket] += delta / total
+        self._m2[bucket] += delta * (value - self._mean[bucket])
+        self._count[bucket] = total
+
+        if seen < self.sketch_size:
+            if seen >= self._sketch.shape[1]:
+                self._widen(seen + 1)
+            self._sketch[bucket, seen] = value
+        else:
+            slot = self.rng.integers(0, seen + 1)
+            if slot < self.sketch_size:
+                self._sketch[bucket, slot] = value
+
+    def _sample(self, bucket, seen, values):
+        # Reservoir sampling (algorithm R), vectorized over the batch
+        self._widen(seen + len(values))
+        sketch = self._sketch[bucket]
+        fill = min(max(self.sketch_size - seen, 0), len(values))
+        sketch[seen:seen + fill] = values[:fill]
+        rest = values[fill:]
+        if len(rest):
+            # The item with global index i replaces slot j ~ U[0, i] when j falls inside the reservoir
+            slots = self.rng.integers(0, np.arange(seen + fill, seen + len(values)) + 1)
+            keep = slots < self.sketch_size
+            sketch[slots[keep]] = rest[keep]
+
+    def merge(self, other):
+        # Fold another accumulator (e.g. from a worker process) into this one
+        if other.bucket_size != self.bucket_size or other.sketch_size != self.sketch_size:
+            raise ValueError("Can only merge RegretStats with the same bucket and sketch size")
+        n = other.n_buckets
+        self._grow(n)
+        n_a, n_b = self._count[:n], other._count[:n]
+        total = n_a + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = other._mean[:n] - self._mean[:n]
+            mean = self._mean[:n] + np.where(total > 0, delta * n_b / total, 0.0)
+            m2 = self._m2[:n] + other._m2[:n] + np.where(total > 0, delta ** 2 * n_a * n_b / total, 0.0)
+
+        for bucket in np.flatnonzero(n_b):
+            self._merge_sketch(bucket, n_a[bucket], other._sketch[bucket], n_b[bucket])
+        self._mean[:n], self._m2[:n], self._count[:n] = mean, m2, total
+
+    def _merge_sketch(self, bucket, n_a, sketch_b, n_b):
+        sample_a = self._sketch[bucket][:min(n_a, self.sketch_size)]
+        sample_b = sketch_b[:min(n_b, self.sketch_size)]
+        pool = np.concatenate([sample_a, sample_b])
+        self._widen(len(pool))
+        # Every retained item stands for count / sample_size original samples
+        weights = np.concatenate([np.full(len(sample_a), n_a / max(len(sample_a), 1)),
+                                  np.full(len(sample_b), n_b / max(len(sample_b), 1))])
+        size = min(len(pool), self.sketch_size)
+        picked = self.rng.choice(len(pool), size=size, replace=False, p=weights / weights.sum())
+        self._sketch[bucket] = np.nan
+        self._sketch[bucket][:size] = pool[picked]
+
+    @property
+    def steps(self):
+        # First time step of every bucket, the x axis for plots
+        return np.arange(self.n_buckets) * self.bucket_size
+
+    @property
+    def count(self):
+        return self._count[:self.n_buckets].copy()
+
+    @property
+    def mean(self):
+        return self._mean[:self.n_buckets].copy()
+
+    @property
+    def std(self):
+        count = self._count[:self.n_buckets]
+        return np.sqrt(self._m2[:self.n_buckets] / np.maximum(count, 1))
+
+    def quantile(self, q):
+        # Approximate quantile(s) per bucket from the reservoir samples
+        sketch = self._sketch[:self.n_buckets]
+        if not len(sketch):
+            return np.zeros((np.size(q), 0)) if np.ndim(q) else np.zeros(0)
+        return np.nanquantile(sketch, q, axis=1)
+
+    def summary(self):
+        if not self.n_buckets:
+            return "no samples"
+        low, median, high = self.quantile([0.05, 0.5, 0.95])[:, -1]
+        return (f"final regret {self._mean[self.n_buckets - 1]:.2f} +/- {self.std[-1]:.2f} "
+                f"(median {median:.2f}, 5%-95% {low:.2f}-{high:.2f}, {self._count[self.n_buckets - 1]} samples)")
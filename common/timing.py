@@ -0,0 +1,124 @@
+import atexit
+import json
+import os
+import sys
+import time
+
+# Span timers for the game loops. Off unless the GAME_TIMING environment variable is set:
+#   GAME_TIMING=1              print a per-phase table to stderr at exit
+#   GAME_TIMING=timing.json    also dump the table and the raw histograms to that file
+# When off, span() hands out one shared do-nothing context manager, so a timed phase costs a method
+# call and an empty with-block. When on, each phase keeps a histogram of its durations in
+# power-of-two nanosecond buckets (bucket b holds durations in [2^(b-1), 2^b) ns), which is a few
+# integers per phase no matter how long the game runs.
+
+ENV_VAR = "GAME_TIMING"
+N_BUCKETS = 64
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter_ns() - self.start)
+        return False
+
+class SpanHistogram:
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns):
+        self.counts[min(ns.bit_length(), N_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def quantile(self, q):
+        # Upper edge of the bucket holding the q-quantile, so at most 2x too high
+        target = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(1 << bucket, self.max_ns)
+        return self.max_ns
+
+class SpanTimers:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.started = time.perf_counter_ns()
+
+    def span(self, name):
+        # with timers.span("draw"): ...
+        if not self.enabled:
+            return _NULL_SPAN
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = SpanHistogram()
+        return _Span(histogram)
+
+    def summary(self):
+        # {phase: {count, total_ms, mean_us, p50_us, p95_us, p99_us, max_us}} in order of first use
+        return {name: {
+            "count": h.count,
+            "total_ms": h.total_ns / 1e6,
+            "mean_us": h.total_ns / h.count / 1e3,
+            "p50_us": h.quantile(0.5) / 1e3,
+            "p95_us": h.quantile(0.95) / 1e3,
+            "p99_us": h.quantile(0.99) / 1e3,
+            "max_us": h.max_ns / 1e3,
+        } for name, h in self.histograms.items() if h.count}
+
+    def report(self):
+        wall_ms = (time.perf_counter_ns() - self.started) / 1e6
+        lines = [f"Phase timings over {wall_ms:.0f} ms (p50/p95/p99 are histogram bucket upper edges)",
+                 f"{'phase':<24}{'count':>9}{'total ms':>11}{'share':>8}{'mean us':>10}"
+                 f"{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'max us':>10}"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:<24}{s['count']:>9}{s['total_ms']:>11.1f}{s['total_ms'] / wall_ms:>8.1%}"
+                         f"{s['mean_us']:>10.1f}{s['p50_us']:>10.1f}{s['p95_us']:>10.1f}{s['p99_us']:>10.1f}"
+                         f"{s['max_us']:>10.1f}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        data = {"phases": self.summary(),
+                "histograms_ns_log2": {name: h.counts for name, h in self.histograms.items()}}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+
+def _from_env():
+    setting = os.environ.get(ENV_VAR, "")
+    timers = SpanTimers(enabled=setting not in ("", "0"))
+    if timers.enabled:
+        def _at_exit():
+            if not timers.histograms:
+                return
+            print(timers.report(), file=sys.stderr)
+            if setting != "1":
+                timers.dump(setting)
+        atexit.register(_at_exit)
+    return timers
+
+# The process-wide timers every game loop reports to
+timers = _from_env()
+span = timers.span
@@ -0,0 +1,172 @@
+import argparse
+import os
+import sys
+
+# One entry point for both games, run from the repository root:
+#   python -m play th --policy ucb                       the Treasure Hunt window, like TH_UCB.py
+#   python -m play th --headless --episodes 10000        vectorized runs over all cores, no window
+#   python -m play battle --policy temp                  the battle window, like temp.py
+#   python -m play battle --headless --episodes 5000 --plot regret.png
+#   python -m play th --headless --episodes 100 --log logs  every decision, see common/decision_log.py
+#
+# Imports are deferred to the command that needs them: a headless run never loads pygame, and
+# matplotlib is only imported (with the non-interactive Agg backend) when --plot asks for a file.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+GAME_DIRS = {"th": "TreasureHuntGame", "battle": "DraganBallZ"}
+TH_SCRIPTS = {"aps": "TH_APS.py", "ucb": "TH_UCB.py"}
+# Battle policies: (script, rule variant, player 2 for the headless engine)
+BATTLE_POLICIES = {
+    "aps": ("battle_APS.py", "battle_APS", "aps"),
+    "ucb": ("battle_UCB.py", "battle_UCB", "ucb"),
+    "temp": ("temp.py", "temp", "aps"),
+    "human": ("battle_APS_human.py", "battle_APS_human", "aps:0.05"),
+}
+
+def _use_game(game):
+    game_dir = os.path.join(ROOT, GAME_DIRS[game])
+    if game_dir not in sys.path:
+        sys.path.insert(0, game_dir)
+    return game_dir
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def _save_plot(plt, path):
+    plt.savefig(path)
+    plt.close()
+    print(f"Plot written to {path}")
+
+def run_window(game_dir, script, argv, seed, plot, log):
+    # Runs one of the original scripts as if started from its own directory
+    if log:
+        os.environ["GAME_LOG"] = log  # The scripts open their decision log from the environment
+    if plot:
+        os.environ["MPLBACKEND"] = "Agg"  # The script's plt.show() then returns at once
+    if seed is not None:
+        import random
+        import numpy as np
+        random.seed(seed)
+        np.random.seed(seed)
+    import runpy
+
+    os.chdir(game_dir)
+    sys.argv = [script] + argv
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit:
+        pass
+    if plot:
+        _save_plot(_pyplot(), plot)
+
+def treasure_hunt(args):
+    game_dir = _use_game("th")
+    if not args.headless:
+        if args.episodes != 1:
+            sys.exit("--episodes needs --headless, the window plays one episode")
+        argv = ["--render-every", str(args.render_every)] + (["--fps", str(args.fps)] if args.fps else [])
+        run_window(game_dir, TH_SCRIPTS[args.policy], argv, args.seed, args.plot, args.log)
+        return
+
+    if args.log:
+        # Logging runs in this process, one DecisionLog for all episodes
+        from common.decision_log import DecisionLog
+        from th_sim import simulate
+
+        meta = {"policy": args.policy, "episodes": args.episodes, "steps": args.steps, "seed": args.seed,
+                "eta": args.eta}
+        with DecisionLog(os.path.join(args.log, f"th_{args.policy}"), meta=meta) as log:
+            curves = simulate(args.policy, args.episodes, args.steps, args.seed, args.eta, log=log)
+    else:
+        from th_runner import run_parallel
+
+        curves = run_parallel(args.policy, args.episodes, args.steps, args.seed, args.eta, workers=args.workers)
+    print(f"{args.policy}: {curves.stats.summary()}")
+    if args.plot:
+        plt = _pyplot()
+        plt.plot(curves.stats.steps, curves.mean, label=f'{args.policy.upper()} mean')
+        if args.episodes > 1:
+            low, high = curves.stats.quantile([0.05, 0.95])
+            plt.fill_between(curves.stats.steps, low, high, alpha=0.2)
+        plt.xlabel('Time step')
+        plt.ylabel('Cumulative Regret')
+        plt.ylim(0,200)
+        plt.legend()
+        _save_plot(plt, args.plot)
+
+def battle(args):
+    game_dir = _use_game("battle")
+    script, variant, player2 = BATTLE_POLICIES[args.policy]
+    if not args.headless:
+        if args.episodes != 1:
+            sys.exit("--episodes needs --headless, the window plays one battle")
+        run_window(game_dir, script, [], args.seed, args.plot, args.log)
+        return
+    if args.log:
+        sys.exit("--log records the battle window or headless Treasure Hunt runs, not headless battles")
+
+    import numpy as np
+    from battle_tournament import play_match
+
+    rows = play_match(args.player1, player2, args.episodes, variant, args.seed, args.workers,
+                      max_turns=args.max_turns)
+    winner, turns, player1_regret, player2_regret = rows.T
+    print(f"{args.policy} ({variant} rules) vs {args.player1}, {args.episodes} battles: "
+          f"player 1 wins {np.mean(winner == 1):.3f}, player 2 wins {np.mean(winner == 2):.3f}, "
+          f"draws {np.mean(winner == 0):.3f}, unfinished {np.mean(winner == -1):.3f}, "
+          f"mean turns {turns.mean():.1f}, player 2 mean regret {player2_regret.mean():.1f}")
+    if args.plot:
+        plt = _pyplot()
+        plt.hist(player2_regret, bins=50, label='Player 2 Regret')
+        plt.xlabel('Regret per battle')
+        plt.ylabel('Battles')
+        plt.title(f'Regret of Player 2 over {args.episodes} battles')
+        plt.legend()
+        _save_plot(plt, args.plot)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m play", description="Treasure Hunt and Dragon Ball Z battles")
+    games = parser.add_subparsers(dest="game", required=True)
+
+    th = games.add_parser("th", help="Treasure Hunt")
+    th.add_argument("--policy", choices=sorted(TH_SCRIPTS), default="aps")
+    th.add_argument("--steps", type=int, default=3000, help="Steps per episode (headless only)")
+    th.add_argument("--eta", type=float, default=0.05, help="APS learning rate (headless only)")
+    th.add_argument("--render-every", type=int, default=1, metavar="N",
+                    help="Only draw every Nth step and run the simulation uncapped")
+    th.add_argument("--fps", type=float, default=None,
+                    help="Draw at most this many frames per second and run the simulation uncapped")
+    th.set_defaults(run=treasure_hunt)
+
+    fight = games.add_parser("battle", help="Dragon Ball Z battle")
+    fight.add_argument("--policy", choices=list(BATTLE_POLICIES), default="aps",
+                       help="Player 2's bandit and rules: the script of the same name (temp: APS with temp.py's rules)")
+    fight.add_argument("--player1", default="random",
+                       help="Player 1 in headless runs: random, scripted, aps[:eta], ucb, minimax or minimax:reward")
+    fight.add_argument("--max-turns", type=int, default=5000,
+                       help="Headless battles still running after this many turns count as unfinished")
+    fight.set_defaults(run=battle)
+
+    for sub in (th, fight):
+        sub.add_argument("--headless", action="store_true", help="No window: simulate with the vectorized engine")
+        sub.add_argument("--episodes", type=int, default=1, help="Episodes (battles) to simulate, headless only")
+        sub.add_argument("--seed", type=int, default=None)
+        sub.add_argument("--workers", type=int, default=None, help="Headless worker processes, defaults to all cores")
+        sub.add_argument("--plot", default=None, metavar="PATH",
+                         help="Write the regret plot to this file instead of showing it")
+        sub.add_argument("--log", default=None, metavar="DIR",
+                         help="Write every decision to columnar files in this directory")
+
+    args = parser.parse_args(argv)
+    # The window mode changes directory
+    if args.plot:
+        args.plot = os.path.abspath(args.plot)
+    if args.log:
+        args.log = os.path.abspath(args.log)
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
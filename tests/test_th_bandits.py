@@ -0,0 +1,44 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "TreasureHuntGame"))
+
+from th_bandits import BernoulliAPSBandit, SumTreeAPSBandit
+
+# SumTreeAPSBandit must make the same choices as BernoulliAPSBandit: both draw one np.random.rand() per
+# pull, so with the same global seed the arms match as long as the weights (and the tree sums the
+# sampling walks) stay accurate. The zero-reward, high-eta case drives the lazy scale far out of range.
+
+def _play_both(n_arms, eta, n_steps, probabilities, seed):
+    np.random.seed(seed)
+    rng = np.random.default_rng(seed)
+    reference, tree = BernoulliAPSBandit(n_arms, eta), SumTreeAPSBandit(n_arms, eta)
+    rebuilds = 0
+    for step in range(n_steps):
+        state = np.random.get_state()
+        arm = reference.pull_arm()
+        np.random.set_state(state)
+        assert tree.pull_arm() == arm, f"arm choices differ at step {step}"
+        reward = int(rng.random() < probabilities[arm])
+        reference.update_exploration_weights(arm, reward)
+        scale = tree.scale
+        tree.update_exploration_weights(arm, reward)
+        rebuilds += tree.scale == 1.0 and scale != 1.0
+        if step % 100 == 0 or step == n_steps - 1:
+            np.testing.assert_allclose(tree.exploration_weights, reference.exploration_weights, rtol=1e-9)
+    return rebuilds
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("n_arms, eta, n_steps, zero_rewards", [
+    (4, 2.0, 20000, False),
+    (4, 2.0, 20000, True),
+    (50, 0.05, 20000, False),
+    (200, 0.3, 5000, True),
+])
+def test_sum_tree_matches_reference(n_arms, eta, n_steps, zero_rewards):
+    probabilities = np.zeros(n_arms) if zero_rewards else np.random.default_rng(n_arms).random(n_arms)
+    rebuilds = _play_both(n_arms, eta, n_steps, probabilities, seed=7)
+    if zero_rewards:
+        assert rebuilds > 0  # The scale left its band and was folded back in